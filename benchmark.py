@@ -0,0 +1,239 @@
+# benchmark.py
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import discord
+import numpy as np
+
+from bot.cogs import menus
+from bot.helpers.drafting import DraftError, TeamDraft, MapVeto, MapVote, MatchTypeVote
+from bot.helpers.players import PlayerTable
+
+
+class _Channel:
+    """ Text channel stand-in that partial messages can be created from. """
+
+    type = discord.ChannelType.text
+    _state = None
+    guild = None
+    category = None
+
+    def get_partial_message(self, message_id):
+        return discord.PartialMessage(channel=self, id=message_id)
+
+
+class _Message:
+    """ Message stand-in holding only what the menus read. """
+
+    def __init__(self, message_id, channel):
+        self.id = message_id
+        self.channel = channel
+
+
+class _Member:
+    """ Member stand-in for the menus' participants. """
+
+    def __init__(self, member_id):
+        self.id = member_id
+        self.display_name = f'Player {member_id}'
+        self.mention = f'<@{member_id}>'
+
+
+def bench_menus(args):
+    """ Measure the memory held by concurrent menus of every type. """
+    channel = _Channel()
+    members = [_Member(member_id) for member_id in range(10)]
+    factories = {
+        'ReadyMenu': lambda msg: menus.ReadyMenu(msg, None, members),
+        'TeamDraftMenu': lambda msg: menus.TeamDraftMenu(msg, None, members),
+        'MapVetoMenu': lambda msg: menus.MapVetoMenu(msg, None),
+        'MapVoteMenu': lambda msg: menus.MapVoteMenu(msg, None, members),
+        'MatchTypeVoteMenu': lambda msg: menus.MatchTypeVoteMenu(msg, None, members[:2]),
+    }
+
+    print(f'{args.menus} concurrent menus of each type:')
+
+    for name, factory in factories.items():
+        messages = [_Message(message_id, channel) for message_id in range(args.menus)]
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        held = [factory(message) for message in messages]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'    {name:<18} {after - before:>9} bytes ({(after - before) / len(held):.0f} bytes/menu)')
+
+
+def simulate_draft(rng, num_players):
+    """ Draft random players with random, partly invalid or timed out picks and check the teams. """
+    players = list(range(num_players))
+    scores = {player: rng.random() for player in players}
+    state = TeamDraft(players)
+
+    if rng.random() < 0.5:
+        state.set_captains(*rng.sample(players, 2))
+
+    actions = 0
+
+    while not state.done:
+        actions += 1
+
+        if rng.random() < 0.05:
+            state.auto_pick(scores.get)
+            continue
+
+        try:
+            state.pick(rng.choice(players), rng.choice(players))
+        except DraftError:
+            pass
+
+    team_one, team_two = state.teams
+    assert sorted(team_one + team_two) == players, 'players lost or picked twice'
+    assert abs(len(team_one) - len(team_two)) <= 1, 'unbalanced teams'
+    return actions
+
+
+def simulate_veto(rng, num_maps):
+    """ Ban random maps with random, partly invalid captains or timed out turns and check the maps left. """
+    maps = list(range(7))
+    ban_rates = {m: rng.random() for m in maps}
+    captains = ['captain_1', 'captain_2', 'player']
+    state = MapVeto(maps, captains[:2], num_maps)
+    actions = 0
+
+    while not state.done:
+        actions += 1
+
+        if rng.random() < 0.05:
+            state.auto_ban(ban_rates.get, rng)
+            continue
+
+        try:
+            state.ban(rng.choice(captains), rng.choice(maps))
+        except DraftError:
+            pass
+
+    assert len(state.result()) == num_maps, 'wrong number of maps left'
+    return actions
+
+
+def simulate_votes(rng, num_players):
+    """ Run a map vote where random players don't vote and a match type vote, then check the winners. """
+    maps = list(range(7))
+    players = list(range(num_players))
+    state = MapVote(maps, players)
+    actions = 0
+
+    while True:
+        for player in rng.sample(players, rng.randint(0, num_players)):
+            actions += 1
+
+            try:
+                state.vote(player, rng.choice(maps))
+            except DraftError:
+                pass
+
+        winners = state.close_round(rng)
+
+        if winners is not None:
+            break
+
+    assert len(winners) == 1 and winners[0] in maps, 'no single winning map'
+
+    state = MatchTypeVote(players[:2])
+
+    for player in players[:3]:
+        actions += 1
+
+        try:
+            state.vote(player, rng.randint(1, 4))
+        except DraftError:
+            pass
+
+    assert state.result() in (1, 2, 3), 'invalid match type'
+    return actions
+
+
+def bench_draft(args):
+    """ Fuzz the draft, veto and vote state machines headlessly and measure their throughput. """
+    rng = random.Random(args.seed)
+    simulations = {
+        'TeamDraft': lambda: simulate_draft(rng, rng.randrange(2, args.max_players + 1, 2)),
+        'MapVeto': lambda: simulate_veto(rng, rng.randint(1, 3)),
+        'MapVote': lambda: simulate_votes(rng, rng.randint(2, args.max_players)),
+    }
+
+    print(f'{args.games} random games of each phase (seed {args.seed}):')
+
+    for name, simulate in simulations.items():
+        start = time.perf_counter()
+        actions = sum(simulate() for _ in range(args.games))
+        elapsed = time.perf_counter() - start
+        print(f'    {name:<18} {actions:>9} actions in {elapsed:.2f}s ({actions / elapsed:.0f} actions/s)')
+
+
+def bench_ranking(args):
+    """ Time ranking a synthetic leaderboard by every metric. """
+    rng = np.random.default_rng(args.seed)
+    matches = rng.integers(0, 200, args.players)
+    wins = rng.binomial(matches, 0.5)
+    draws = rng.binomial(matches - wins, 0.05)
+    rounds = matches * rng.integers(16, 30, args.players)
+    kills = rng.binomial(rounds, 0.7)
+    columns = {
+        'score': rng.integers(0, 3000, args.players),
+        'kills': kills,
+        'deaths': rng.binomial(rounds, 0.7),
+        'headshots': rng.binomial(kills, 0.45),
+        'damage': rounds * rng.integers(40, 120, args.players),
+        'rounds': rounds,
+        'wins': wins,
+        'losses': matches - wins - draws,
+        'draws': draws
+    }
+    table = PlayerTable(np.arange(args.players), [f'Player {num}' for num in range(args.players)], columns)
+    print(f'Top {args.limit} of {args.players} players ({args.runs} runs, at least {args.min_matches} matches):')
+
+    for metric in PlayerTable.METRICS:
+        start = time.perf_counter()
+
+        for _ in range(args.runs):
+            table.rank(metric, args.limit, 0, args.min_matches)
+
+        elapsed = time.perf_counter() - start
+        print(f'    {metric:<18} {elapsed / args.runs * 1000:>9.2f} ms/ranking')
+
+
+def main():
+    """ Parse the arguments and run the requested benchmark. """
+    parser = argparse.ArgumentParser(description='Benchmark the CS:GO League bot hot paths')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    menus_parser = subparsers.add_parser('menus', help='Memory held by concurrent menus')
+    menus_parser.add_argument('--menus', type=int, default=100, help='Number of concurrent menus of each type')
+    menus_parser.set_defaults(func=bench_menus)
+
+    draft_parser = subparsers.add_parser('draft', help='Fuzz and time the draft, veto and vote logic')
+    draft_parser.add_argument('--games', type=int, default=10000, help='Number of random games of each phase')
+    draft_parser.add_argument('--max-players', type=int, default=10, help='Maximum number of players per game')
+    draft_parser.add_argument('--seed', type=int, default=0, help='Random seed of the simulation')
+    draft_parser.set_defaults(func=bench_draft)
+
+    ranking_parser = subparsers.add_parser('ranking', help='Time the leaderboard rankings of a large guild')
+    ranking_parser.add_argument('--players', type=int, default=100000, help='Number of players in the leaderboard')
+    ranking_parser.add_argument('--limit', type=int, default=25, help='Number of players ranked')
+    ranking_parser.add_argument('--min-matches', type=int, default=5, help='Matches needed to be ranked')
+    ranking_parser.add_argument('--runs', type=int, default=100, help='Number of rankings of each metric')
+    ranking_parser.add_argument('--seed', type=int, default=0, help='Random seed of the leaderboard')
+    ranking_parser.set_defaults(func=bench_ranking)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,19 @@
 
 import discord
 from discord.ext import commands
-from discord.utils import get
 
 from . import cogs
 from . import helpers
-from .helpers.utils import Map
+from .cogs.menus import ReactionRouter
+from .helpers.assets import map_icons
+from .helpers.tracing import traced_request
+from .helpers.utils import Map, load_catalog, set_locale, set_log_context
 
 import aiohttp
 import asyncio
 import json
 import sys
+import time
 import traceback
 import os
 import logging
@@ -19,12 +22,20 @@ import logging
 
 _CWD = os.path.dirname(os.path.abspath(__file__))
 INTENTS_JSON = os.path.join(_CWD, 'intents.json')
+EMOJI_UPLOADS = 3  # Concurrent emoji uploads, the rest wait for a slot
+
+# Events dispatched before the bot is ready, the others wait until the map emojis are resolved
+UNGATED_EVENTS = {'connect', 'disconnect', 'ready', 'resumed', 'shard_connect', 'shard_disconnect', 'shard_ready',
+                  'shard_resumed', 'socket_raw_receive', 'socket_raw_send', 'socket_response', 'error'}
 
 
 class LeagueBot(commands.AutoShardedBot):
     """ Sub-classed AutoShardedBot modified to fit the needs of the application. """
 
-    def __init__(self, discord_token, api_base_url, api_key, db_connect_url, donate_url = None):
+    def __init__(self, discord_token, api_base_url, api_key, db_connect_url, donate_url = None,
+                 webhook_host='127.0.0.1', webhook_port=None, webhook_secret=None,
+                 metrics_host='127.0.0.1', metrics_port=None, trace_dir=None, slow_statement_ms=100,
+                 loop_lag_ms=250):
         """ Set attributes and configure bot. """
         # Call parent init
         with open(INTENTS_JSON) as f:
@@ -39,18 +50,51 @@ class LeagueBot(commands.AutoShardedBot):
         self.api_key = api_key
         self.db_connect_url = db_connect_url
         self.donate_url = donate_url
+        self.webhook_host = webhook_host
+        self.webhook_port = webhook_port
+        self.webhook_secret = webhook_secret
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self.trace_dir = trace_dir
+        self.slow_statement_ms = slow_statement_ms
+        self.loop_lag_ms = loop_lag_ms
         self.all_maps = {}
+        self.league_ready = False
+        self.held_events = []
+        self.started_at = None
+        self.stored_emojis = None
+        self.pug_locales = {}  # Language of each pug category, None for the default
 
         # Set constants
         self.color = 0x0086FF
         self.activity = discord.Activity(type=discord.ActivityType.watching, name="CS:GO League")
         self.logger = logging.getLogger('csgoleague.bot')
 
-        # Create session for API
+        # Instrument the hot paths only when the metrics are served
+        self.metrics = helpers.Metrics() if self.metrics_port else None
+
+        # Watch the event loop for callbacks blocking every guild at once
+        self.watchdog = helpers.LoopWatchdog(self.loop, threshold=self.loop_lag_ms / 1000, metrics=self.metrics)
+
+        # Create API helper, its session is started in setup
         self.api_helper = helpers.ApiHelper(self.loop, self.api_base_url, self.api_key)
 
-        # Create DB helper to use connection pool
-        self.db_helper = helpers.DBHelper(self.db_connect_url)
+        # Create DB helper, its connection pool is created in setup
+        self.db_helper = helpers.DBHelper(self.db_connect_url, self.slow_statement_ms)
+
+        # Resolve Steam profiles in threads so linking never blocks the loop, the threads are created in setup
+        self.steam_resolver = helpers.SteamResolver(self.loop)
+
+        # Trace the matches as they start, with the REST, API and DB calls of each
+        self.tracer = None
+
+        if self.trace_dir:
+            self.tracer = helpers.Tracer(self.loop, self.trace_dir)
+            self.api_helper.trace_configs.append(self.tracer.trace_config())
+            self.http.request = traced_request(self.http.request)
+
+        # Route menu reactions through a single listener
+        self.reaction_router = ReactionRouter(self)
 
         # Initialize set of errors to ignore
         self.ignore_error_types = set()
@@ -59,8 +103,8 @@ class LeagueBot(commands.AutoShardedBot):
         self.add_check(lambda ctx: ctx.guild is not None)
         self.ignore_error_types.add(commands.errors.CheckFailure)
 
-        # Trigger typing before every command
-        self.before_invoke(commands.Context.trigger_typing)
+        # Translate and trigger typing before every command
+        self.before_invoke(self.prepare_command)
 
         # Add cogs
         self.add_cog(cogs.LoggingCog(self))
@@ -72,6 +116,15 @@ class LeagueBot(commands.AutoShardedBot):
         if self.donate_url:
             self.add_cog(cogs.DonateCog(self))
 
+        if self.webhook_port:
+            if self.webhook_secret:
+                self.add_cog(cogs.WebhookCog(self))
+            else:
+                self.logger.warning('Match webhook disabled: a secret is required to verify the requests')
+
+        if self.metrics_port:
+            self.add_cog(cogs.MetricsCog(self))
+
     async def on_error(self, event_method, *args, **kwargs):
         """"""
         try:
@@ -98,6 +151,24 @@ class LeagueBot(commands.AutoShardedBot):
         except KeyError:
             return None
 
+    async def use_locale(self, category):
+        """ Translate the rest of the current event in the language of the pug the category belongs to. """
+        if category is None:
+            set_locale(None)
+            return
+
+        set_log_context(guild=category.guild.id, category=category.id)
+
+        if category.id not in self.pug_locales:
+            self.pug_locales[category.id] = await self.get_pug_data(category, 'language')
+
+        set_locale(self.pug_locales[category.id])
+
+    async def prepare_command(self, ctx):
+        """ Resolve the language of the pug then trigger typing. """
+        await self.use_locale(ctx.channel.category)
+        await ctx.trigger_typing()
+
     async def is_pug_channel(self, ctx):
         """"""
         try:
@@ -111,32 +182,140 @@ class LeagueBot(commands.AutoShardedBot):
             return False
         return True
 
-    async def create_emojis(self):
-        """ Upload custom map emojis to guilds. """
-        url_path = 'https://raw.githubusercontent.com/thboss/CSGO-PUGs-Bot/master/assets/maps/icons/'
-        icons_dic = 'assets/maps/icons/'
-        icons = os.listdir(icons_dic)
-        emojis = [e.name for e in self.guilds[0].emojis]
+    async def create_emojis(self, stored=None):
+        """ Resolve the map emojis stored for the map icons and upload the missing ones concurrently. """
+        icons = map_icons()
+
+        if stored is None:
+            stored = await self.db_helper.get_map_emojis()
+        emojis = {}
+        missing = []
+
+        for icon in icons:
+            row = stored.get(icon.dev_name)
+            emoji = None
+
+            if row is not None and row['content_hash'] == icon.content_hash:
+                emoji = self.get_emoji(row['emoji_id'])
+
+            if emoji is None:
+                missing.append(icon)
+            else:
+                emojis[icon.dev_name] = emoji
+
+        if missing:
+            uploaded = await self._upload_emojis(missing, stored)
+            emojis.update(uploaded)
 
         for icon in icons:
-            if icon.endswith('.png') and '-' in icon and os.stat(icons_dic + icon).st_size < 256000:
-                emoji_name = icon.split('-')[0]
-                emoji_dev = icon.split('-')[1].split('.')[0]
-                if emoji_dev not in emojis:
-                    with open(icons_dic + icon, 'rb') as image:
-                        emoji = await self.guilds[0].create_custom_emoji(name=emoji_dev, image=image.read())
-                else:
-                    emoji = get(self.guilds[0].emojis, name=emoji_dev)
-
-                    self.all_maps[emoji_dev] = Map(emoji_name,emoji_dev,
-                                                     f'<:{emoji_dev}:{emoji.id}>',
-                                                     f'{url_path}{icon.replace(" ", "%20")}')
+            if icon.dev_name in emojis:
+                emoji = f'<:{icon.dev_name}:{emojis[icon.dev_name].id}>'
+                self.all_maps[icon.dev_name] = Map(icon.name, icon.dev_name, emoji, icon.url)
+
+    async def _upload_emojis(self, icons, stored):
+        """ Upload map icons as emojis of the first guild a few at a time and store them. """
+        if not self.guilds:
+            self.logger.warning('Map emojis not uploaded: the bot is not in any guild')
+            return {}
+
+        guild = self.guilds[0]
+        existing = {emoji.name: emoji for emoji in guild.emojis}
+        semaphore = asyncio.Semaphore(EMOJI_UPLOADS)
+
+        async def upload(icon):
+            """ Upload an icon unless an up to date emoji of it is already in the guild. """
+            emoji = existing.get(icon.dev_name)
+            row = stored.get(icon.dev_name)
+
+            async with semaphore:
+                if emoji is not None and row is not None and row['content_hash'] != icon.content_hash:
+                    await emoji.delete(reason='Map icon changed')
+                    emoji = None
+
+                if emoji is None:
+                    self.logger.info(f'Uploading emoji of map {icon.dev_name}')
+                    emoji = await guild.create_custom_emoji(name=icon.dev_name, image=icon.read())
+
+            return emoji
+
+        results = await asyncio.gather(*(upload(icon) for icon in icons), return_exceptions=True)
+        uploaded = {}
+
+        for icon, result in zip(icons, results):
+            if isinstance(result, BaseException):
+                self.logger.error(f'Failed to upload emoji of map {icon.dev_name}: {result}')
+            else:
+                uploaded[icon.dev_name] = result
+
+        rows = [(icon.dev_name, uploaded[icon.dev_name].id, icon.content_hash) for icon in icons
+                if icon.dev_name in uploaded]
+        await self.db_helper.upsert_map_emojis(guild.id, *rows)
+        return uploaded
+
+    async def _timed(self, stage, awaitable):
+        """ Await a startup stage and log how long it took. """
+        start = time.perf_counter()
+        result = await awaitable
+        self.logger.info(f'Startup stage "{stage}" took {(time.perf_counter() - start) * 1000:.0f} ms')
+        return result
+
+    async def setup(self):
+        """ Connect the helpers and warm the caches up concurrently before connecting to Discord. """
+        self.started_at = time.perf_counter()
+        self.watchdog.start()
+        self.steam_resolver.start()
+
+        async def database():
+            """ Create the pool then prefetch the map emojis with it. """
+            await self._timed('database pool', self.db_helper.connect())
+            return await self._timed('map emojis prefetch', self.db_helper.get_map_emojis())
+
+        results = await asyncio.gather(self._timed('API session', self.api_helper.connect()),
+                                       self._timed('asset manifest', self.loop.run_in_executor(None, map_icons)),
+                                       database())
+        self.stored_emojis = results[2]
+
+        # Serve the webhook and the metrics only now, building the bot never starts a task
+        for cog in list(self.cogs.values()):
+            if hasattr(cog, 'start_server'):
+                await cog.start_server()
+
+        catalog = load_catalog()
+
+        for locale, keys in catalog.missing.items():
+            self.logger.warning(f'Locale "{locale}" is missing {len(keys)} texts, english is used: {", ".join(keys)}')
+
+        for locale, keys in catalog.unknown.items():
+            self.logger.warning(f'Locale "{locale}" has {len(keys)} texts english does not have: {", ".join(keys)}')
+
+        self.logger.info(f'Setup done in {(time.perf_counter() - self.started_at) * 1000:.0f} ms')
+
+    def dispatch(self, event_name, *args, **kwargs):
+        """ Override parent dispatch to hold events back until the bot is ready. """
+        if self.league_ready or event_name in UNGATED_EVENTS:
+            super().dispatch(event_name, *args, **kwargs)
+        else:
+            self.held_events.append((event_name, args, kwargs))
 
     @commands.Cog.listener()
     async def on_ready(self):
-        """ Synchronize the guilds the bot is in with the guilds table. """
+        """ Resolve the map emojis then release the events held until now. """
         print('Creating emojis...')
-        await self.create_emojis()
+        stored, self.stored_emojis = self.stored_emojis, None
+
+        try:
+            await self._timed('map emojis', self.create_emojis(stored))
+        finally:  # Never keep the events held if the emojis failed
+            if not self.league_ready:
+                self.league_ready = True
+                self.logger.info(f'Ready {time.perf_counter() - self.started_at:.2f} s after start, '
+                                 f'releasing {len(self.held_events)} held events')
+                held_events, self.held_events = self.held_events, []
+                self.dispatch('league_ready')
+
+                for event_name, args, kwargs in held_events:
+                    self.dispatch(event_name, *args, **kwargs)
+
         print('Bot is ready!')
 
     @commands.Cog.listener()
@@ -148,8 +327,15 @@ class LeagueBot(commands.AutoShardedBot):
         """ Override parent run to automatically include Discord token. """
         super().run(self.discord_token)
 
+    async def start(self, *args, **kwargs):
+        """ Override parent start to set the bot up before connecting to Discord. """
+        await self.setup()
+        await super().start(*args, **kwargs)
+
     async def close(self):
         """ Override parent close to close the API session also. """
         await super().close()
+        self.watchdog.stop()
         await self.api_helper.close()
         await self.db_helper.close()
+        self.steam_resolver.close()
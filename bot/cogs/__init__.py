@@ -6,6 +6,8 @@ from .help import HelpCog
 from .queue import QueueCog
 from .match import MatchCog
 from .commands import CommandsCog
+from .webhook import WebhookCog
+from .metrics import MetricsCog
 
 __all__ = [
     LoggingCog,
@@ -13,5 +15,7 @@ __all__ = [
     HelpCog,
     QueueCog,
     MatchCog,
-    CommandsCog
+    CommandsCog,
+    WebhookCog,
+    MetricsCog
 ]
@@ -3,9 +3,18 @@
 from discord.ext import commands
 from discord.utils import get
 from discord.errors import NotFound
-from steam.steamid import SteamID, from_url
 
-from bot.helpers.utils import align_text, translate
+from bot.helpers.utils import LazyTranslation, align_text, get_locale, load_catalog, set_locale, translate
+
+LEADERS_PER_PAGE = 5
+MAX_LEADERS_PER_PAGE = 25
+LEADERS_MIN_MATCHES = 5  # Matches needed to be ranked by a ratio
+METRIC_HEADERS = {'score': 'Score', 'kd': 'K/D', 'adr': 'ADR', 'hs': 'HS', 'winrate': 'Winrate'}
+SLOWEST_MATCHES = 5  # Matches listed by the slowest command by default
+MAX_SLOWEST_MATCHES = 20
+SLOWEST_PHASES = 3  # Phases listed for each of the slowest matches
+DB_STATS_STATEMENTS = 15  # Statements listed by the dbstats command, those taking the most time first
+METRIC_FORMATS = {'score': '{}', 'kd': '{:.2f}', 'adr': '{:.1f}', 'hs': '{:.2%}', 'winrate': '{:.2%}'}
 
 
 class CommandsCog(commands.Cog):
@@ -17,7 +26,7 @@ class CommandsCog(commands.Cog):
         self.queue_cog = self.bot.get_cog('QueueCog')
 
     @commands.command(usage='create <name>',
-                      brief=translate('command-create-brief'))
+                      brief=LazyTranslation('command-create-brief'))
     @commands.has_permissions(administrator=True)
     async def create(self, ctx, *args):
         args = ' '.join(arg for arg in args)
@@ -47,7 +56,7 @@ class CommandsCog(commands.Cog):
         embed = self.bot.embed_template(title=msg)
         await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-delete-brief'))
+    @commands.command(brief=LazyTranslation('command-delete-brief'))
     @commands.has_permissions(administrator=True)
     async def delete(self, ctx):
         if not await self.bot.is_pug_channel(ctx):
@@ -65,7 +74,7 @@ class CommandsCog(commands.Cog):
             await channel.delete()
 
     @commands.command(usage='link <mention> <Steam ID/Profile>',
-                      brief=translate('command-link-brief'))
+                      brief=LazyTranslation('command-link-brief'))
     async def link(self, ctx, *args):
         """ Force link player with steam on the backend. """
         if not await self.bot.is_pug_channel(ctx):
@@ -97,16 +106,14 @@ class CommandsCog(commands.Cog):
 
             try:
                 user = ctx.message.mentions[0]
-                steam_id = SteamID(args[1])
+                profile = args[1]
             except IndexError:
                 title = f"**{translate('invalid-usage')}: `{self.bot.command_prefix[0]}link <mention> <steam profile>`**"
             else:
-                if not steam_id.is_valid():
-                    steam_id = from_url(args[1], http_timeout=15)
-                    if steam_id is None:
-                        steam_id = from_url(f'https://steamcommunity.com/id/{args[1]}/', http_timeout=15)
-                        if steam_id is None:
-                            raise commands.UserInputError(message='Please enter a valid SteamID or community url.')
+                steam_id = await self.bot.steam_resolver.resolve(profile)
+
+                if steam_id is None:
+                    raise commands.UserInputError(message='Please enter a valid SteamID or community url.')
 
                 link = await self.bot.api_helper.force_link_discord(user.id, steam_id)
                 member_ids = [member.id for member in ctx.guild.members]
@@ -137,7 +144,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(usage='unlink <mention>',
-                      brief=translate('command-unlink-brief'))
+                      brief=LazyTranslation('command-unlink-brief'))
     @commands.has_permissions(administrator=True)
     async def unlink(self, ctx):
         """ Unlink a player by delete him on the backend. """
@@ -163,7 +170,7 @@ class CommandsCog(commands.Cog):
         embed = self.bot.embed_template(title=title)
         await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-check-brief'))
+    @commands.command(brief=LazyTranslation('command-check-brief'))
     async def check(self, ctx):
         if not await self.bot.is_pug_channel(ctx):
             return
@@ -180,7 +187,7 @@ class CommandsCog(commands.Cog):
         embed = self.bot.embed_template(description=msg, color=self.bot.color)
         await ctx.send(content=ctx.author.mention, embed=embed)
 
-    @commands.command(brief=translate('command-empty-brief'))
+    @commands.command(brief=LazyTranslation('command-empty-brief'))
     @commands.has_permissions(kick_members=True)
     async def empty(self, ctx):
         """ Reset the pug's queue list to empty. """
@@ -207,7 +214,7 @@ class CommandsCog(commands.Cog):
         await self.queue_cog.update_last_msg(ctx.channel.category, embed)
 
     @commands.command(usage='cap [new capacity]',
-                      brief=translate('command-cap-brief'))
+                      brief=LazyTranslation('command-cap-brief'))
     @commands.has_permissions(administrator=True)
     async def cap(self, ctx, *args):
         """ Set the queue capacity. """
@@ -248,7 +255,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=self.bot.embed_template(title=msg))
 
     @commands.command(usage='spectators {+|-} <mention> <mention> ...',
-                      brief=translate('command-spectators-brief'))
+                      brief=LazyTranslation('command-spectators-brief'))
     async def spectators(self, ctx, *args):
         """"""
         if not await self.bot.is_pug_channel(ctx):
@@ -294,7 +301,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(usage='teams {captains|autobalance|random}',
-                      brief=translate('command-teams-brief'))
+                      brief=LazyTranslation('command-teams-brief'))
     @commands.has_permissions(administrator=True)
     async def teams(self, ctx, method=None):
         """ Set or display the method by which teams are created. """
@@ -321,7 +328,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(usage='captains {volunteer|rank|random}',
-                      brief=translate('command-captains-brief'))
+                      brief=LazyTranslation('command-captains-brief'))
     @commands.has_permissions(administrator=True)
     async def captains(self, ctx, method=None):
         """ Set or display the method by which captains are selected. """
@@ -349,7 +356,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(usage='mpool {+|-}<map name> ...',
-                      brief=translate('command-mpool-brief'))
+                      brief=LazyTranslation('command-mpool-brief'))
     async def mpool(self, ctx, *args):
         """ Edit the guild's map pool for map drafts. """
         if not await self.bot.is_pug_channel(ctx):
@@ -408,7 +415,7 @@ class CommandsCog(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(usage='maps [{captains|vote|random}]',
-                      brief=translate('command-maps-brief'))
+                      brief=LazyTranslation('command-maps-brief'))
     @commands.has_permissions(administrator=True)
     async def maps(self, ctx, method=None):
         """ Set or display the method by which the teams are created. """
@@ -434,8 +441,94 @@ class CommandsCog(commands.Cog):
         embed = self.bot.embed_template(title=title)
         await ctx.send(embed=embed)
 
+    @commands.command(usage='combinedvote [{on|off}]',
+                      brief=LazyTranslation('command-combinedvote-brief'))
+    @commands.has_permissions(administrator=True)
+    async def combinedvote(self, ctx, state=None):
+        """ Set or display whether the match type and the maps are voted at once. """
+        if not await self.bot.is_pug_channel(ctx):
+            return
+
+        combined_vote = await self.bot.get_pug_data(ctx.channel.category, 'combined_vote')
+        valid_states = {'on': True, 'off': False}
+        curr_state = 'on' if combined_vote else 'off'
+
+        if state is None:
+            title = translate('combined-vote', curr_state)
+        else:
+            state = state.lower()
+
+            if state == curr_state:
+                title = translate('combined-vote-already', curr_state)
+            elif state in valid_states:
+                title = translate('set-combined-vote', state)
+                await self.bot.db_helper.update_pug(ctx.channel.category_id, combined_vote=valid_states[state])
+            else:
+                title = translate('combined-vote-valid-states', 'on', 'off')
+
+        embed = self.bot.embed_template(title=title)
+        await ctx.send(embed=embed)
+
+    @commands.command(usage='language [language]',
+                      brief=LazyTranslation('command-language-brief'))
+    @commands.has_permissions(administrator=True)
+    async def language(self, ctx, locale=None):
+        """ Set or display the language of the pug. """
+        if not await self.bot.is_pug_channel(ctx):
+            return
+
+        locales = load_catalog().locales
+        curr_locale = get_locale()
+
+        if locale is None:
+            title = translate('language', curr_locale)
+        else:
+            locale = locale.lower()
+
+            if locale == curr_locale:
+                title = translate('language-already', curr_locale)
+            elif locale in locales:
+                await self.bot.db_helper.update_pug(ctx.channel.category_id, language=locale)
+                self.bot.pug_locales[ctx.channel.category_id] = locale
+                set_locale(locale)
+                title = translate('set-language', locale)
+            else:
+                title = translate('language-not-valid', locale, ', '.join(f'`{name}`' for name in locales))
+
+        embed = self.bot.embed_template(title=title)
+        await ctx.send(embed=embed)
+
+    @commands.command(usage='turntime [seconds]',
+                      brief=LazyTranslation('command-turntime-brief'))
+    @commands.has_permissions(administrator=True)
+    async def turntime(self, ctx, *args):
+        """ Set or display the time captains have for each pick and ban. """
+        if not await self.bot.is_pug_channel(ctx):
+            return
+
+        turn_time = await self.bot.get_pug_data(ctx.channel.category, 'turn_time')
+
+        if len(args) == 0:
+            title = translate('turn-time', turn_time)
+        else:
+            try:
+                new_time = int(args[0])
+            except ValueError:
+                title = f'{translate("invalid-usage")}: `{self.bot.command_prefix[0]}turntime <seconds>`'
+            else:
+                if new_time == turn_time:
+                    title = translate('turn-time-already', turn_time)
+                elif new_time < 10 or new_time > 600:
+                    title = translate('turn-time-out-range')
+                else:
+                    title = translate('set-turn-time', new_time)
+                    await self.bot.db_helper.update_pug(ctx.channel.category_id, turn_time=new_time)
+
+        embed = self.bot.embed_template(title=title)
+        await ctx.send(embed=embed)
+
     @commands.command(usage='end [match id]',
-                      brief=translate('command-end-brief'))
+                      brief=LazyTranslation('command-end-brief'))
     @commands.has_permissions(administrator=True)
     async def end(self, ctx, *args):
         """ Force end a match. """
@@ -457,7 +550,70 @@ class CommandsCog(commands.Cog):
         embed = self.bot.embed_template(title=msg)
         await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-stats-brief'))
+    @commands.command(usage='slowest [number of matches]',
+                      brief=LazyTranslation('command-slowest-brief'))
+    @commands.has_permissions(administrator=True)
+    async def slowest(self, ctx, *args):
+        """ Show the recent matches of the pug that took the longest to start and their slowest phases. """
+        if not await self.bot.is_pug_channel(ctx):
+            return
+
+        try:
+            num = int(args[0]) if args else SLOWEST_MATCHES
+        except ValueError:
+            msg = f'{translate("invalid-usage")}: `{self.bot.command_prefix[0]}{ctx.command.usage}`'
+            await ctx.send(embed=self.bot.embed_template(title=msg))
+            return
+
+        if self.bot.tracer is None:
+            embed = self.bot.embed_template(title=translate('tracing-disabled'))
+            await ctx.send(embed=embed)
+            return
+
+        traces = self.bot.tracer.slowest(min(max(num, 1), MAX_SLOWEST_MATCHES), ctx.channel.category_id)
+
+        if not traces:
+            embed = self.bot.embed_template(title=translate('no-traced-matches'))
+            await ctx.send(embed=embed)
+            return
+
+        lines = []
+
+        for trace in traces:
+            phases = ', '.join(f'{name} {duration:.0f}s' for name, duration in trace.phases()[:SLOWEST_PHASES])
+            lines.append(f'**{trace.match_id or "-"}** {trace.duration:.0f}s ({trace.outcome}): {phases}')
+
+        embed = self.bot.embed_template(title=translate('slowest-matches'), description='\n'.join(lines))
+        await ctx.send(embed=embed)
+
+    @commands.command(brief=LazyTranslation('command-dbstats-brief'))
+    @commands.has_permissions(administrator=True)
+    async def dbstats(self, ctx):
+        """ Show the database statements taking the most time with their recent duration percentiles. """
+        if not await self.bot.is_pug_channel(ctx):
+            return
+
+        statement_stats = sorted(self.bot.db_helper.statement_stats.items(), key=lambda item: item[1].total,
+                                 reverse=True)[:DB_STATS_STATEMENTS]
+
+        if not statement_stats:
+            embed = self.bot.embed_template(title=translate('no-db-stats'))
+            await ctx.send(embed=embed)
+            return
+
+        width = max(len(name) for name, stats in statement_stats)
+        lines = [f'{"":<{width}}  calls  p50 ms  p99 ms  wait p99  total s']
+
+        for name, stats in statement_stats:
+            p50, p99, wait_p50, wait_p99 = stats.percentiles(0.5, 0.99)
+            lines.append(f'{name:<{width}} {stats.calls:>6} {p50 * 1000:>7.1f} {p99 * 1000:>7.1f} '
+                         f'{wait_p99 * 1000:>9.1f} {stats.total:>8.1f}')
+
+        description = '```\n' + '\n'.join(lines) + '```'
+        embed = self.bot.embed_template(title=translate('db-stats'), description=description)
+        await ctx.send(embed=embed)
+
+    @commands.command(brief=LazyTranslation('command-stats-brief'))
     async def stats(self, ctx):
         """ Send an embed containing stats data parsed from the player object returned from the API. """
         if not await self.bot.is_pug_channel(ctx):
@@ -491,46 +647,103 @@ class CommandsCog(commands.Cog):
 
         await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-leaders-brief'))
-    async def leaders(self, ctx):
-        """ Send an embed containing the leaderboard data parsed from the player objects returned from the API. """
+    @commands.command(usage='leaders [{score|kd|adr|hs|winrate}] [page] [players per page]',
+                      brief=LazyTranslation('command-leaders-brief'))
+    async def leaders(self, ctx, *args):
+        """ Send an embed containing a page of the guild's leaderboard ranked by a metric. """
+        from bot.helpers.players import PlayerTable  # Only needed for the leaderboard, numpy is slow to import
+
         if not await self.bot.is_pug_channel(ctx):
             return
 
-        num = 5  # Easily modfiy the number of players on the leaderboard
-        guild_players = await self.bot.api_helper.get_players([user.id for user in ctx.guild.members])
+        metric = 'score'
+
+        if args and args[0].lower() in PlayerTable.METRICS:
+            metric = args[0].lower()
+            args = args[1:]
+
+        try:
+            page = int(args[0]) if len(args) > 0 else 1
+            num = int(args[1]) if len(args) > 1 else LEADERS_PER_PAGE
+        except ValueError:
+            msg = f'{translate("invalid-usage")}: `{self.bot.command_prefix[0]}{ctx.command.usage}`'
+            await ctx.send(embed=self.bot.embed_template(title=msg))
+            return
+
+        page = max(page, 1)
+        num = min(max(num, 1), MAX_LEADERS_PER_PAGE)
+
+        if not await self.bot.db_helper.is_leaderboard_built(ctx.guild.id):  # Only past match players are stored
+            member_ids = [user.id for user in ctx.guild.members]
+            guild_players = await self.bot.api_helper.get_players(member_ids)
+            await self.bot.db_helper.update_leaderboard(ctx.guild.id, *guild_players)
+            await self.bot.db_helper.prune_leaderboard(ctx.guild.id, member_ids)
+            await self.bot.db_helper.insert_leaderboard_guild(ctx.guild.id)
 
-        if len(guild_players) == 0:
+        total = await self.bot.db_helper.count_leaders(ctx.guild.id)
+
+        if metric == 'score':  # Ranked by the leaderboard index, only the page is read
+            min_matches = 0
+        else:  # Ratios are ranked from every row of the guild at once
+            min_matches = LEADERS_MIN_MATCHES
+            table = PlayerTable.from_rows(await self.bot.db_helper.get_leaderboard(ctx.guild.id))
+            total = table.rank(metric, 0, 0, min_matches)[1]
+
+        if total == 0:
             embed = self.bot.embed_template(title=translate("nobody-ranked"))
             await ctx.send(embed=embed)
+            return
+
+        num_pages = (total - 1) // num + 1
+        page = min(page, num_pages)
+
+        if metric == 'score':
+            table = PlayerTable.from_rows(await self.bot.db_helper.get_leaders(ctx.guild.id, num, (page - 1) * num))
+            indices = range(len(table))
+        else:
+            indices = table.rank(metric, num, (page - 1) * num, min_matches)[0]
 
-        guild_players.sort(key=lambda u: (u.score, u.matches_played), reverse=True)
+        def display_name(index):
+            """ Current name of the member, or their name when the leaderboard was updated if they left. """
+            member = ctx.guild.get_member(int(table.ids[index]))
+            return member.display_name if member is not None else table.names[index]
 
-        # Select the top players only
-        if len(guild_players) > num:
-            guild_players = guild_players[:num]
+        values = table.metric(metric)
+        win_percent = table.win_percent
+        matches_played = table.matches_played
 
         # Generate leaderboard text
-        data = [['Player'] + [ctx.guild.get_member(player.discord).display_name for player in guild_players],
-                ['Score'] + [str(player.score) for player in guild_players],
-                ['Winrate'] + [f'{player.win_percent * 100:.2f}%' for player in guild_players],
-                ['Played'] + [str(player.matches_played) for player in guild_players]]
+        data = [['Player'] + [display_name(index) for index in indices],
+                [METRIC_HEADERS[metric]] + [METRIC_FORMATS[metric].format(values[index]) for index in indices],
+                ['Winrate'] + [METRIC_FORMATS['winrate'].format(win_percent[index]) for index in indices],
+                ['Played'] + [str(matches_played[index]) for index in indices]]
+
+        if metric == 'winrate':
+            del data[2]
+
         data[0] = [name if len(name) < 12 else name[:9] + '...' for name in data[0]]  # Shorten long names
         widths = list(map(lambda x: len(max(x, key=len)), data))
-        aligns = ['left', 'right', 'right', 'right']
+        aligns = ['left'] + ['right'] * (len(data) - 1)
         z = zip(data, widths, aligns)
         formatted_data = [list(map(lambda x: align_text(x, width, align), col)) for col, width, align in z]
         formatted_data = list(map(list, zip(*formatted_data)))  # Transpose list for .format() string
-        description = '```ml\n    {}  {}  {}  {} \n'.format(*formatted_data[0])
+        rank_width = len(str((page - 1) * num + len(indices)))
+        description = '```ml\n' + ' ' * (rank_width + 3) + '  '.join(formatted_data[0]) + ' \n'
 
-        for rank, player_row in enumerate(formatted_data[1:], start=1):
-            description += ' {}. {}  {}  {}  {} \n'.format(rank, *player_row)
+        for rank, player_row in enumerate(formatted_data[1:], start=(page - 1) * num + 1):
+            description += f' {rank:>{rank_width}}. ' + '  '.join(player_row) + ' \n'
 
         description += '```'
 
         # Send leaderboard
         title = f'__{translate("server-leaderboard")}__'
         embed = self.bot.embed_template(title=title, description=description)
+        footer = translate('leaderboard-page', page, num_pages)
+
+        if min_matches:
+            footer += f' | {translate("leaderboard-min-matches", min_matches)}'
+
+        embed.set_footer(text=footer)
         await ctx.send(embed=embed)
 
     @create.error
@@ -541,8 +754,13 @@ class CommandsCog(commands.Cog):
     @teams.error
     @captains.error
     @maps.error
+    @combinedvote.error
+    @language.error
+    @turntime.error
     @mpool.error
     @end.error
+    @slowest.error
+    @dbstats.error
     @unlink.error
     @link.error
     async def config_error(self, ctx, error):
@@ -1,9 +1,8 @@
 # help.py
 
 from discord.ext import commands
-import Levenshtein as lev
 
-from bot.helpers.utils import translate
+from bot.helpers.utils import LazyTranslation, translate
 
 GITHUB = 'https://github.com/thboss/CSGO-PUGs-Bot'  # TODO: Use git API to get link to repo?
 SERVER_INV = 'https://discord.gg/b5MhANU'
@@ -37,6 +36,10 @@ class HelpCog(commands.Cog):
     async def on_command_error(self, ctx, error):
         """ Send help message when a mis-entered command is received. """
         if type(error) is commands.CommandNotFound:
+            import Levenshtein as lev  # Only needed for mistyped commands
+
+            await self.bot.use_locale(ctx.channel.category)  # Commands not found are not prepared
+
             # Get Levenshtein distance from commands
             in_cmd = ctx.invoked_with
             bot_cmds = list(self.bot.commands)
@@ -57,13 +60,13 @@ class HelpCog(commands.Cog):
             embed = self.bot.embed_template(title=embed_title)
             await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-help-brief'))
+    @commands.command(brief=LazyTranslation('command-help-brief'))
     async def help(self, ctx):
         """ Generate and send help embed based on the bot's commands. """
         embed = self.help_embed(translate('league-commands'))
         await ctx.send(embed=embed)
 
-    @commands.command(brief=translate('command-about-brief'))
+    @commands.command(brief=LazyTranslation('command-about-brief'))
     async def about(self, ctx):
         """ Display the info embed. """
         description = (
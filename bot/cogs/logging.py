@@ -1,12 +1,72 @@
 # logging.py
 
 import __main__
+import atexit
 from discord.ext import commands
+import json
 import logging
 from logging import config
+from logging.handlers import QueueHandler, QueueListener
 from os import path
+from queue import SimpleQueue
 import traceback
 
+from bot.helpers.utils import get_log_context, sample_debug, set_debug_sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formats records as JSON objects with the structured fields they carry. """
+
+    FIELDS = ('guild', 'category', 'match_id', 'latency_ms')
+
+    def format(self, record):
+        """ Serialize the record. """
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+
+            if value is not None:
+                data[field] = value
+
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """ Adds the fields of the current event's log context to the records. """
+
+    def filter(self, record):
+        """ Set the fields the record doesn't already have. """
+        for field, value in get_log_context().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """ Keeps a random share of the debug records and every record above. """
+
+    def filter(self, record):
+        """ Sample the debug records, the ones sampled before they were built are kept. """
+        return record.levelno > logging.DEBUG or getattr(record, 'sampled', False) or sample_debug()
+
+
+class RecordQueueHandler(QueueHandler):
+    """ Queues the records unformatted so the listener thread formats them. """
+
+    def prepare(self, record):
+        """ Queue the record as is, the base handler would format its message and traceback on the calling thread. """
+        return record
+
 
 LOGGING_CONFIG = {
     'version': 1,
@@ -18,6 +78,10 @@ LOGGING_CONFIG = {
         'defaultNoDate': {
             'format': '[%(asctime)s][%(name)s][%(levelname)s] %(message)s',
             'datefmt': '%H:%M:%S'
+        },
+        'json': {
+            '()': JsonFormatter,
+            'datefmt': '%Y-%m-%dT%H:%M:%S'
         }
     },
     'handlers': {
@@ -31,7 +95,7 @@ LOGGING_CONFIG = {
             'class': 'logging.handlers.RotatingFileHandler',
             'formatter': 'default',
             'level': 'DEBUG',
-            'filename': path.join(path.dirname(path.abspath(__main__.__file__)), 'bot.log'),
+            'filename': 'bot.log',  # Set next to the main script when the logging is set up
             'maxBytes': 7340032,
             'encoding': 'utf-8'
         }
@@ -56,7 +120,50 @@ LOGGING_CONFIG = {
     }
 }
 
-config.dictConfig(LOGGING_CONFIG)
+_listener = None
+
+
+def setup_logging(json_file=False, debug_sample_rate=1.0):
+    """ Configure the handlers once and run them in a thread so logging never writes from the event loop. """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    main_file = getattr(__main__, '__file__', None)  # Interactive sessions have no main script
+    log_dir = path.dirname(path.abspath(main_file)) if main_file else '.'
+    LOGGING_CONFIG['handlers']['file']['filename'] = path.join(log_dir, 'bot.log')
+    LOGGING_CONFIG['handlers']['file']['formatter'] = 'json' if json_file else 'default'
+    config.dictConfig(LOGGING_CONFIG)
+
+    # Records are only filtered and queued on the loop, the listener thread formats and writes them
+    root = logging.getLogger()
+    queue = SimpleQueue()
+    queue_handler = RecordQueueHandler(queue)
+    queue_handler.addFilter(ContextFilter())
+    set_debug_sample_rate(debug_sample_rate)
+
+    if debug_sample_rate <= 0:  # Not even build the debug records
+        logging.getLogger('csgoleague').setLevel(logging.INFO)
+    elif debug_sample_rate < 1:
+        queue_handler.addFilter(SampleFilter())
+
+    _listener = QueueListener(queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [queue_handler]
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """ Write the records left in the queue, then log from the calling thread again. """
+    global _listener
+
+    if _listener is None:
+        return
+
+    _listener.stop()
+    logging.getLogger().handlers = list(_listener.handlers)
+    _listener = None
 
 
 def indent(string, n=4):
@@ -80,7 +187,8 @@ class LoggingCog(commands.Cog):
     """ Does the console printing of the bot. """
 
     def __init__(self, bot):
-        """ Set bot attribute. """
+        """ Set bot attribute and make sure the logging is set up. """
+        setup_logging()
         self.bot = bot
         self.logger = logging.getLogger('csgoleague.bot')
 
@@ -117,7 +225,8 @@ class LoggingCog(commands.Cog):
     @commands.Cog.listener()
     async def on_command(self, ctx):
         lines_dict = {'Caller': f'{ctx.author} ({ctx.author.id})', 'Guild': f'{ctx.guild} ({ctx.guild.id})'}
-        log_lines(logging.INFO, 'Command "%s" issued', ctx.command, sub_lines=lines_dict)
+        log_lines(logging.INFO, 'Command "%s" issued', ctx.command, sub_lines=lines_dict,
+                  extra={'guild': ctx.guild.id, 'category': ctx.channel.category_id})
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
@@ -4,18 +4,28 @@ import aiohttp
 import asyncio
 from discord.ext import commands, tasks
 from discord.utils import get
-from discord.errors import HTTPException
+from discord.errors import HTTPException, NotFound
 
 from . import menus
-from bot.helpers.utils import translate
+from bot.helpers.backlog import MatchBacklog, PendingMatch
+from bot.helpers.tracing import get_trace, span
+from bot.helpers.utils import set_log_context, translate
 
 from random import shuffle, choice
 from traceback import print_exception
 from collections import defaultdict
+from datetime import datetime, timezone
+import logging
 import sys
 import os
 
 
+MIN_POLL_INTERVAL = 5.0  # Seconds between matches_status polls for matches about to end
+MAX_POLL_INTERVAL = 120.0
+WARMUP_DURATION = 360.0  # Servers close after 5 minutes if nobody joins, so new matches can end early
+EXPECTED_MAP_DURATION = 1800.0  # A map rarely ends sooner than this once players joined
+
+
 class MatchCog(commands.Cog):
     """ Handles everything needed to create matches. """
 
@@ -26,6 +36,11 @@ class MatchCog(commands.Cog):
         self.match_dict = {}
         self.no_servers = {}
         self.no_servers = defaultdict(lambda: False, self.no_servers)
+        self.backlog = MatchBacklog(self.bot.loop, self.launch_match, self.expire_match)
+        self.min_poll_interval = MIN_POLL_INTERVAL
+        self.last_statuses = {}  # Statuses of the last poll, re-applied while the API answers they didn't change
+        self.restored = False
+        self.logger = logging.getLogger('csgoleague.match')
 
     async def draft_teams(self, message, members):
         """ Create a TeamDraftMenu from an existing message and run the draft. """
@@ -98,7 +113,14 @@ class MatchCog(commands.Cog):
         voted_type = await menu.vote()
         return voted_type
 
-    async def create_match_channels(self, league_category, match_id, members_team_one, members_team_two):
+    async def vote_match_type_and_maps(self, message, mpool, members, captains):
+        """"""
+        menu = menus.CombinedVoteMenu(message, self.bot, members, captains)
+        num_maps, map_pick = await menu.vote(mpool)
+        return num_maps, map_pick
+
+    async def create_match_channels(self, league_category, match_id, members_team_one, members_team_two, maps=(),
+                                    message_id=None):
         """ Create teams voice channels and move players into. """
 
         match_category = await league_category.guild.create_category_channel(f'{translate("match")}{match_id}')
@@ -121,7 +143,23 @@ class MatchCog(commands.Cog):
                                      'channel_team_one': channel_team_one,
                                      'channel_team_two': channel_team_two,
                                      'members_team_one': members_team_one,
-                                     'members_team_two': members_team_two}
+                                     'members_team_two': members_team_two,
+                                     'num_maps': max(len(maps), 1),
+                                     'started_at': self.bot.loop.time(),
+                                     'message_id': message_id}
+        self.count_phase('live')
+
+        if message_id is not None:
+            await self.bot.db_helper.update_match(message_id,
+                                                  phase='live',
+                                                  started_at=datetime.now(timezone.utc),
+                                                  match_id=match_id,
+                                                  match_category=match_category.id,
+                                                  channel_team_one=channel_team_one.id,
+                                                  channel_team_two=channel_team_two.id,
+                                                  members_team_one=[member.id for member in members_team_one],
+                                                  members_team_two=[member.id for member in members_team_two],
+                                                  maps=list(maps))
 
         lobby_id = await self.bot.get_pug_data(league_category, 'voice_lobby')
         lobby = self.bot.get_channel(lobby_id)
@@ -141,14 +179,38 @@ class MatchCog(commands.Cog):
             except (AttributeError, HTTPException):
                 pass
 
+    def count_phase(self, phase):
+        """ Count a match entering a phase when the metrics are enabled. """
+        if self.bot.metrics is not None:
+            self.bot.metrics.match_phases.inc(phase)
+
     async def end_match(self, matchid):
         """ Move match players to pre-lobby and delete teams voice channels on match end. """
+        match = self.match_dict.pop(matchid, None)
 
-        lobby_id = await self.bot.get_pug_data(self.match_dict[matchid]['league_category'], 'voice_lobby')
+        if match is None:  # Already torn down
+            return
+
+        try:
+            await self.tear_down_match(matchid, match)
+        except Exception:
+            self.match_dict.setdefault(matchid, match)  # Retried on the next poll
+            raise
+
+        await self.update_leaderboard(match['league_category'].guild,
+                                      match['members_team_one'] + match['members_team_two'])
+
+    async def tear_down_match(self, matchid, match):
+        """ Move the players of an ended match back and delete its channels. """
+        league_category = match['league_category']
+        set_log_context(guild=league_category.guild.id, category=league_category.id, match_id=matchid)
+        self.count_phase('ended')
+
+        lobby_id = await self.bot.get_pug_data(match['league_category'], 'voice_lobby')
         lobby = self.bot.get_channel(lobby_id)
-        prelobby_id = await self.bot.get_pug_data(self.match_dict[matchid]['league_category'], 'voice_prelobby')
+        prelobby_id = await self.bot.get_pug_data(match['league_category'], 'voice_prelobby')
         prelobby = self.bot.get_channel(prelobby_id)
-        match_players = self.match_dict[matchid]['members_team_one'] + self.match_dict[matchid]['members_team_two']
+        match_players = match['members_team_one'] + match['members_team_two']
 
         for player in match_players:
             await lobby.set_permissions(player, overwrite=None)
@@ -157,15 +219,76 @@ class MatchCog(commands.Cog):
             except (AttributeError, HTTPException):
                 pass
 
-        await self.match_dict[matchid]['channel_team_two'].delete()
-        await self.match_dict[matchid]['channel_team_one'].delete()
-        await self.match_dict[matchid]['match_category'].delete()
+        for channel in [match['channel_team_two'], match['channel_team_one'], match['match_category']]:
+            try:
+                await channel.delete()
+            except (AttributeError, NotFound):  # Channel was deleted while the bot was offline
+                pass
+
+        if match['message_id'] is not None:
+            await self.bot.db_helper.delete_matches(match['message_id'])
+
+    async def update_leaderboard(self, guild, members):
+        """ Refresh the leaderboard rows of the match players with their stats after the match, best-effort. """
+        member_ids = [member.id for member in members]
+
+        if not member_ids:
+            return
+
+        try:
+            players = await self.bot.api_helper.get_players(member_ids)
+            await self.bot.db_helper.update_leaderboard(guild.id, *players)
+        except Exception:  # Rows are refreshed again after the players' next match
+            self.logger.exception(f'Unable to refresh the leaderboard of guild {guild.id}')
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        """ Drop a member who left the guild from its leaderboard. """
+        await self.bot.db_helper.delete_leaders(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        """ Drop the leaderboard of a guild the bot left. """
+        await self.bot.db_helper.delete_leaderboard(guild.id)
+
+    @commands.Cog.listener('on_league_ready')
+    async def prune_leaderboards(self):
+        """ Drop the members who left while the bot was offline from the leaderboards. """
+        for guild in self.bot.guilds:
+            if guild.unavailable or not guild.chunked:  # Member list is incomplete
+                continue
+
+            pruned = await self.bot.db_helper.prune_leaderboard(guild.id, [member.id for member in guild.members])
+
+            if pruned:
+                self.logger.info(f'Removed {len(pruned)} departed members from the leaderboard of guild {guild.id}')
 
-        self.match_dict.pop(matchid)
+    async def end_matches(self, *matchids):
+        """ Tear down ended matches concurrently and hand their servers to the backlog. """
+        results = await asyncio.gather(*(self.end_match(matchid) for matchid in matchids),
+                                       loop=self.bot.loop, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                print_exception(type(result), result, result.__traceback__, file=sys.stderr)
+
+        self.backlog.kick()  # Servers freed up for backlogged matches
 
     async def start_match(self, category, members):
         """ Ready all the members up and start a match. """
-
+        trace = self.bot.tracer.start(category.id) if self.bot.tracer is not None else None
+        started = False
+
+        try:
+            started = await self.trace_match(category, members)
+            return started
+        finally:
+            if trace is not None:
+                outcome = 'live' if trace.match_id is not None else 'backlogged' if started else 'not started'
+                self.bot.tracer.finish(trace, outcome)
+
+    async def trace_match(self, category, members):
+        """ Start a match, the phases are recorded in the match trace if the matches are traced. """
         queue_cog = self.bot.get_cog('QueueCog')
         msg = queue_cog.last_queue_msgs.get(category)
         channel_id = await self.bot.get_pug_data(category, 'text_queue')
@@ -175,8 +298,23 @@ class MatchCog(commands.Cog):
             await msg.delete()
             queue_cog.last_queue_msgs.pop(category)
 
-        self.ready_message[category] = await text_channel.send(''.join([member.mention for member in members]))
-        ready_users = await self.track_ready(self.ready_message[category], members)
+        message = self.ready_message[category] = await text_channel.send(''.join([member.mention for member in members]))
+        await self.bot.db_helper.insert_match(message.id, category.id, text_channel.id)
+        self.count_phase('ready')
+        started = False
+
+        try:
+            started = await self.ready_and_setup(category, members)
+            return started
+        finally:
+            if not started:  # Only the backlogged and live matches stay registered
+                await self.bot.db_helper.delete_matches(message.id)
+
+    async def ready_and_setup(self, category, members):
+        """ Run the ready check and set the match up if everyone readied up. """
+        with span('ready check'):
+            ready_users = await self.track_ready(self.ready_message[category], members)
+
         await asyncio.sleep(1)
         unreadied = set(members) - ready_users
 
@@ -203,106 +341,362 @@ class MatchCog(commands.Cog):
             await self.ready_message[category].edit(content='', embed=burst_embed)
             return False  # Not everyone readied up
         else:  # Everyone readied up
-            # Attempt to make teams and start match
-            awaitables = [
-                self.ready_message[category].clear_reactions(),
-                self.bot.db_helper.get_pug(category.id)
-            ]
-            results = await asyncio.gather(*awaitables, loop=self.bot.loop)
-
-            team_method = results[1]['team_method']
-            map_method = results[1]['map_method']
+            # Hold a server slot while the teams and maps are being decided
+            reservation = self.bot.api_helper.reserve_server_slot()
 
+            try:
+                return await self.setup_match(category, members, reservation)
+            finally:
+                await reservation.release()  # Nothing to release once the match is committed
+
+    async def run_phase(self, guild, reservation, phase):
+        """ Run a pre-match phase, giving up as soon as the server reservation fails. """
+        self.count_phase(phase.__name__)
+
+        with span(phase.__name__):
+            phase_task = self.bot.loop.create_task(phase)
+            await asyncio.wait([phase_task, reservation.task], return_when=asyncio.FIRST_COMPLETED)
+
+            # Keep going if the match will be able to wait for a server in the backlog
+            if reservation.failed and not self.backlog.has_room(guild):
+                phase_task.cancel()
+                raise reservation.task.exception()
+
+            return await phase_task
+
+    async def setup_match(self, category, members, reservation):
+        """ Make teams, pick maps and start the match on the reserved server. """
+        awaitables = [
+            self.ready_message[category].clear_reactions(),
+            self.bot.db_helper.get_pug(category.id)
+        ]
+        results = await asyncio.gather(*awaitables, loop=self.bot.loop)
+
+        team_method = results[1]['team_method']
+        map_method = results[1]['map_method']
+        combined_vote = results[1]['combined_vote']
+
+        try:
             if team_method == 'random' or len(members) == 2:
                 team_one, team_two = await self.randomize_teams(members)
             elif team_method == 'autobalance':
-                team_one, team_two = await self.autobalance_teams(members)
+                team_one, team_two = await self.run_phase(category.guild, reservation, self.autobalance_teams(members))
             elif team_method == 'captains':
-                team_one, team_two = await self.draft_teams(self.ready_message[category], members)
+                team_one, team_two = await self.run_phase(
+                    category.guild, reservation, self.draft_teams(self.ready_message[category], members))
             else:
                 raise ValueError(translate('team-method-not-valid', team_method))
-            
+
             await self.ready_message[category].clear_reactions()
             await asyncio.sleep(1)
 
-            spect_ids = await self.bot.db_helper.get_spect_users(category.id)
-            spect_members = [category.guild.get_member(member_id) for member_id in spect_ids]
-            spect_players = [await self.bot.api_helper.get_player(spect_id) for spect_id in spect_ids]
-            spect_steams = [str(spect_player.steam) for spect_player in spect_players]
+            spect_members, spect_steams = await self.get_spectators(category)
             # Get map pick
             mpool = [m for m in self.bot.all_maps.values() if await self.bot.get_pug_data(category, m.dev_name)]
 
-            num_maps = await self.vote_match_type(self.ready_message[category], [team_one[0], team_two[0]])
-
-            await self.ready_message[category].clear_reactions()
-            await asyncio.sleep(1)
+            captains = [team_one[0], team_two[0]]
 
-            if map_method == 'captains' or num_maps > 1:
-                map_pick = await self.veto_maps(self.ready_message[category], mpool, team_one[0], team_two[0], num_maps)
-            elif map_method == 'vote':
-                map_pick = await self.vote_maps(self.ready_message[category], mpool, members)
-            elif map_method == 'random':
-                map_pick = await self.random_map(mpool)
+            if map_method == 'vote' and combined_vote:
+                # Match type and maps are voted at once, the most voted maps make a Bo2 or Bo3
+                num_maps, map_pick = await self.run_phase(
+                    category.guild, reservation, self.vote_match_type_and_maps(self.ready_message[category], mpool, members, captains))
             else:
-                raise ValueError(translate('map-method-not-valid', map_method))
-            
-            await self.ready_message[category].clear_reactions()
-            await asyncio.sleep(1)
-            burst_embed = self.bot.embed_template(description=translate('fetching-server'))
-            await self.ready_message[category].edit(content='', embed=burst_embed)
+                num_maps = await self.run_phase(
+                    category.guild, reservation, self.vote_match_type(self.ready_message[category], captains))
+
+                await self.ready_message[category].clear_reactions()
+                await asyncio.sleep(1)
+
+                if map_method == 'captains' or num_maps > 1:
+                    map_pick = await self.run_phase(
+                        category.guild, reservation, self.veto_maps(self.ready_message[category], mpool, team_one[0], team_two[0], num_maps))
+                elif map_method == 'vote':
+                    map_pick = await self.run_phase(category.guild, reservation, self.vote_maps(self.ready_message[category], mpool, members))
+                elif map_method == 'random':
+                    map_pick = await self.random_map(mpool)
+                else:
+                    raise ValueError(translate('map-method-not-valid', map_method))
+        except aiohttp.ClientError as e:  # No server could be reserved and the backlog is full
+            return await self.no_servers_left(category, self.ready_message[category], e)
+
+        await self.ready_message[category].clear_reactions()
+        await asyncio.sleep(1)
+        burst_embed = self.bot.embed_template(description=translate('fetching-server'))
+        await self.ready_message[category].edit(content='', embed=burst_embed)
+        pending = PendingMatch(category, self.ready_message[category], team_one, team_two,
+                               spect_members, spect_steams, map_pick)
+
+        # Check if able to get a match server and edit message embed accordingly
+        try:
+            with span('server allocation'):
+                match = await reservation.commit(team_one, team_two, spect_steams, [m.dev_name for m in map_pick])
+        except aiohttp.ClientResponseError as e:
+            if not self.backlog.has_room(category.guild):
+                return await self.no_servers_left(category, self.ready_message[category], e)
+
+            await self.backlog_match(pending)
+        else:
+            await self.announce_match(pending, match)
+
+        return True  # Everyone readied up
+
+    async def get_spectators(self, category):
+        """ Get the spectators of a pug along with their Steam IDs. """
+        spect_ids = await self.bot.db_helper.get_spect_users(category.id)
+        spect_members = [category.guild.get_member(member_id) for member_id in spect_ids]
+        spect_players = [await self.bot.api_helper.get_player(spect_id) for spect_id in spect_ids]
+        spect_steams = [str(spect_player.steam) for spect_player in spect_players]
+        return spect_members, spect_steams
+
+    async def no_servers_left(self, category, message, error):
+        """ Tell the queue there are no servers, the queue is burst to the pre-lobby. """
+        description = translate('no-servers')
+        burst_embed = self.bot.embed_template(title=translate('problem'), description=description)
+        await message.clear_reactions()
+        await message.edit(content='', embed=burst_embed)
+        print_exception(type(error), error, error.__traceback__, file=sys.stderr)  # Print exception to stderr
+        self.no_servers[category] = True
+        return False
+
+    async def backlog_match(self, pending):
+        """ Park a drafted match in the backlog until a server frees up. """
+        self.count_phase('backlog')
+        lobby_id = await self.bot.get_pug_data(pending.category, 'voice_lobby')
+        lobby = self.bot.get_channel(lobby_id)
+        prelobby_id = await self.bot.get_pug_data(pending.category, 'voice_prelobby')
+        prelobby = self.bot.get_channel(prelobby_id)
 
-            # Check if able to get a match server and edit message embed accordingly
+        # Free the lobby so the next queue can fill while this match waits
+        for member in pending.members:
+            await lobby.set_permissions(member, connect=False)
             try:
-                match = await self.bot.api_helper.start_match(team_one, team_two, spect_steams, [m.dev_name for m in map_pick])
-            except aiohttp.ClientResponseError as e:
-                description = translate('no-servers')
-                burst_embed = self.bot.embed_template(title=translate('problem'), description=description)
-                await self.ready_message[category].edit(embed=burst_embed)
-                print_exception(type(e), e, e.__traceback__, file=sys.stderr)  # Print exception to stderr
-                self.no_servers[category] = True
-                return False
-            else:
-                await asyncio.sleep(3)
+                await member.move_to(prelobby)
+            except (AttributeError, HTTPException):
+                pass
 
-                if len(team_one) > 1:
-                    team1_players = await self.bot.api_helper.get_players([member.id for member in team_one])
-                else:
-                    team1_players = [await self.bot.api_helper.get_player(team_one[0].id)]
+        await self.bot.db_helper.update_match(pending.message.id,
+                                              phase='backlog',
+                                              members_team_one=[member.id for member in pending.team_one],
+                                              members_team_two=[member.id for member in pending.team_two],
+                                              maps=[m.dev_name for m in pending.map_pick])
+        position = self.backlog.push(pending.category.guild, pending)
+        description = ''.join(f'{member.mention} ' for member in pending.members)
+        embed = self.bot.embed_template(title=translate('match-backlogged', position), description=description)
+        embed.set_footer(text=translate('match-backlogged-footer'))
+        await pending.message.edit(content='', embed=embed)
+
+    async def expire_match(self, pending):
+        """ Give up on a backlogged match that waited too long for a server or failed to start. """
+        self.count_phase('expired')
+        await self.bot.use_locale(pending.category)
+        lobby_id = await self.bot.get_pug_data(pending.category, 'voice_lobby')
+        lobby = self.bot.get_channel(lobby_id)
 
-                if len(team_two) > 1:
-                    team2_players = await self.bot.api_helper.get_players([member.id for member in team_two])
-                else:
-                    team2_players = [await self.bot.api_helper.get_player(team_two[0].id)]
+        for member in pending.members:
+            await lobby.set_permissions(member, overwrite=None)
+
+        embed = self.bot.embed_template(title=translate('problem'), description=translate('no-servers'))
+        await pending.message.edit(content='', embed=embed)
+        await self.bot.db_helper.delete_matches(pending.message.id)
+
+    async def launch_match(self, pending):
+        """ Start a backlogged match, raises ClientResponseError while there are still no servers. """
+        await self.bot.use_locale(pending.category)
+        match = await self.bot.api_helper.start_match(pending.team_one, pending.team_two, pending.spect_steams,
+                                                      [m.dev_name for m in pending.map_pick])
+
+        try:
+            await self.announce_match(pending, match)
+        except Exception:  # Match has a server now, dispatching it again would start a duplicate
+            self.logger.exception(f'Unable to announce backlogged match {match.id}')
+
+    async def announce_match(self, pending, match):
+        """ Show the server info and move the players into their team channels. """
+        set_log_context(match_id=match.id)
+        trace = get_trace()
+
+        if trace is not None:
+            trace.match_id = match.id
+
+        team_one = pending.team_one
+        team_two = pending.team_two
+        spect_members = pending.spect_members
+        map_pick = pending.map_pick
+        await asyncio.sleep(3)
+
+        if len(team_one) > 1:
+            team1_players = await self.bot.api_helper.get_players([member.id for member in team_one])
+        else:
+            team1_players = [await self.bot.api_helper.get_player(team_one[0].id)]
+
+        if len(team_two) > 1:
+            team2_players = await self.bot.api_helper.get_players([member.id for member in team_two])
+        else:
+            team2_players = [await self.bot.api_helper.get_player(team_two[0].id)]
 
-                description = f'{translate("server-connect", match.connect_url, match.connect_command)}\n' \
-                              f'**{translate("maps")}:** {" ".join(m.emoji for m in map_pick)}'
-                burst_embed = self.bot.embed_template(title=translate('server-ready'), description=description)
+        description = f'{translate("server-connect", match.connect_url, match.connect_command)}\n' \
+                      f'**{translate("maps")}:** {" ".join(m.emoji for m in map_pick)}'
+        burst_embed = self.bot.embed_template(title=translate('server-ready'), description=description)
 
-                burst_embed.set_author(name=f'{translate("match")}{match.id}', url=match.match_page)
-                burst_embed.set_thumbnail(url=map_pick[0].image_url)
-                
-                burst_embed.add_field(name=f'__{translate("team")} {team_one[0].display_name}__',
-                                      value=''.join(f'{num}. [{member.display_name}]({team1_players[num-1].league_profile})\n' for num, member in enumerate(team_one, start=1)))
-                burst_embed.add_field(name=f'__{translate("team")} {team_two[0].display_name}__',
-                                      value=''.join(f'{num}. [{member.display_name}]({team2_players[num-1].league_profile})\n' for num, member in enumerate(team_two, start=1)))
-                burst_embed.add_field(name=f"__{translate('spectators')}__",
-                                      value=translate('no-spectators') if not spect_members else ''.join(f'{num}. {member.mention}\n' for num, member in enumerate(spect_members, start=1)))
-                burst_embed.set_footer(text=translate('server-message-footer'))
+        burst_embed.set_author(name=f'{translate("match")}{match.id}', url=match.match_page)
+        burst_embed.set_thumbnail(url=map_pick[0].image_url)
 
-            await self.ready_message[category].edit(embed=burst_embed)
-            await self.create_match_channels(category, str(match.id), team_one, team_two)
+        burst_embed.add_field(name=f'__{translate("team")} {team_one[0].display_name}__',
+                              value=''.join(f'{num}. [{member.display_name}]({team1_players[num-1].league_profile})\n' for num, member in enumerate(team_one, start=1)))
+        burst_embed.add_field(name=f'__{translate("team")} {team_two[0].display_name}__',
+                              value=''.join(f'{num}. [{member.display_name}]({team2_players[num-1].league_profile})\n' for num, member in enumerate(team_two, start=1)))
+        burst_embed.add_field(name=f"__{translate('spectators')}__",
+                              value=translate('no-spectators') if not spect_members else ''.join(f'{num}. {member.mention}\n' for num, member in enumerate(spect_members, start=1)))
+        burst_embed.set_footer(text=translate('server-message-footer'))
 
-            if not self.update_matches.is_running():
-                self.update_matches.start()
+        await pending.message.edit(content='', embed=burst_embed)
 
-            return True  # Everyone readied up
+        with span('channel moves'):
+            await self.create_match_channels(pending.category, str(match.id), team_one, team_two,
+                                             [m.dev_name for m in map_pick], pending.message.id)
 
-    @tasks.loop(seconds=5.0)
+        if not self.update_matches.is_running():
+            self.update_matches.change_interval(seconds=self.min_poll_interval)
+            self.update_matches.start()
+        else:  # Poll soon enough for the new match
+            self.update_matches.change_interval(seconds=self.next_poll_interval())
+
+    @commands.Cog.listener()
+    async def on_league_ready(self):
+        """ Resume the matches registered before the bot restarted. """
+        if self.restored:  # Bot only reconnected
+            return
+
+        self.restored = True
+        rows = await self.bot.db_helper.get_matches()
+
+        if not rows:
+            return
+
+        # Reconcile live matches with the API once for all of them
+        statuses = {}
+
+        if any(row['phase'] == 'live' for row in rows):
+            try:
+                statuses = await self.bot.api_helper.matches_status()
+            except aiohttp.ClientError as e:  # The poller ends the matches that ended once the API answers
+                self.logger.warning(f'Unable to get the match statuses, restoring every live match: {e}')
+
+        results = await asyncio.gather(*(self.restore_match(row, statuses) for row in rows),
+                                       loop=self.bot.loop, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                print_exception(type(result), result, result.__traceback__, file=sys.stderr)
+
+        self.logger.info(f'Restored {len(self.match_dict)} live matches and {len(rows) - len(self.match_dict)} others')
+
+        if self.match_dict and not self.update_matches.is_running():
+            self.update_matches.change_interval(seconds=self.min_poll_interval)
+            self.update_matches.start()
+
+    async def restore_match(self, row, statuses):
+        """ Rehydrate a registered match, or clean up after it if it can't be resumed. """
+        category = self.bot.get_channel(row['pug_id'])
+
+        if category is None:  # Pug was deleted
+            await self.bot.db_helper.delete_matches(row['id'])
+            return
+
+        await self.bot.use_locale(category)
+
+        team_one = [category.guild.get_member(member_id) for member_id in row['members_team_one']]
+        team_one = [member for member in team_one if member is not None]
+        team_two = [category.guild.get_member(member_id) for member_id in row['members_team_two']]
+        team_two = [member for member in team_two if member is not None]
+
+        if row['phase'] == 'live':
+            match_id = row['match_id']
+            set_log_context(match_id=match_id)
+            age = (datetime.now(timezone.utc) - row['started_at']).total_seconds()
+            self.match_dict[match_id] = {'league_category': category,
+                                         'match_category': self.bot.get_channel(row['match_category']),
+                                         'channel_team_one': self.bot.get_channel(row['channel_team_one']),
+                                         'channel_team_two': self.bot.get_channel(row['channel_team_two']),
+                                         'members_team_one': team_one,
+                                         'members_team_two': team_two,
+                                         'num_maps': max(len(row['maps']), 1),
+                                         'started_at': self.bot.loop.time() - age,
+                                         'message_id': row['id']}
+
+            if match_id in statuses and not statuses[match_id]:  # Match ended while the bot was offline
+                await self.end_match(match_id)
+
+            return
+
+        try:
+            message = await self.bot.get_channel(row['channel_id']).fetch_message(row['id'])
+        except (AttributeError, NotFound):
+            message = None
+
+        if row['phase'] == 'backlog' and message is not None:
+            map_pick = [self.bot.all_maps[m] for m in row['maps'] if m in self.bot.all_maps]
+            spect_members, spect_steams = await self.get_spectators(category)
+            pending = PendingMatch(category, message, team_one, team_two, spect_members, spect_steams, map_pick)
+            self.backlog.push(category.guild, pending)
+            return
+
+        # Match setup was interrupted, unlock the lobby and let the players queue again
+        await self.bot.db_helper.delete_matches(row['id'])
+        await self.bot.db_helper.delete_all_queued_users(category.id)
+        pug_data = await self.bot.db_helper.get_pug(category.id)
+        lobby = self.bot.get_channel(pug_data['voice_lobby'])
+        prelobby = self.bot.get_channel(pug_data['voice_prelobby'])
+        pug_role = category.guild.get_role(pug_data['pug_role'])
+        await lobby.set_permissions(pug_role, connect=True)
+
+        for member in team_one + team_two:
+            await lobby.set_permissions(member, overwrite=None)
+
+        for member in lobby.members:
+            try:
+                await member.move_to(prelobby)
+            except (AttributeError, HTTPException):
+                pass
+
+        if message is not None:
+            embed = self.bot.embed_template(title=translate('problem'), description=translate('match-interrupted'))
+            await message.clear_reactions()
+            await message.edit(content='', embed=embed)
+
+    def poll_interval(self, match):
+        """ Seconds to wait before checking again if a match has ended, based on its age. """
+        age = self.bot.loop.time() - match['started_at']
+        expected_end = match['num_maps'] * EXPECTED_MAP_DURATION
+
+        if age < WARMUP_DURATION:  # Server may close if nobody joined
+            return WARMUP_DURATION / 10
+        if age >= expected_end:
+            return MIN_POLL_INTERVAL
+
+        # Poll less while the match is far from its expected end
+        return min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, (expected_end - age) / 10))
+
+    def next_poll_interval(self):
+        """ Poll as often as the match closest to its end needs. """
+        interval = min((self.poll_interval(match) for match in self.match_dict.values()), default=MIN_POLL_INTERVAL)
+        return max(interval, self.min_poll_interval)
+
+    @tasks.loop(seconds=MIN_POLL_INTERVAL)
     async def update_matches(self):
         if self.match_dict:
-            matches = await self.bot.api_helper.matches_status()
-            for matchid in list(self.match_dict):
-                if matchid in matches and not matches[matchid]:
-                    await self.end_match(matchid)
+            matches = await self.bot.api_helper.matches_status(conditional=True)
+
+            if matches is None:  # Nothing changed, retry the teardowns that failed on the last poll
+                matches = self.last_statuses
+            else:
+                self.last_statuses = matches
+
+            ended = [matchid for matchid in self.match_dict if matchid in matches and not matches[matchid]]
+
+            if ended:
+                await self.end_matches(*ended)
+
+            self.update_matches.change_interval(seconds=self.next_poll_interval())
         else:
-            self.update_matches.cancel()
\ No newline at end of file
+            self.update_matches.cancel()
@@ -2,9 +2,14 @@
 
 import asyncio
 import discord
-from random import shuffle, choice
+from contextlib import contextmanager
+from functools import lru_cache, partial
+import logging
+from random import shuffle
 
-from bot.helpers.utils import translate
+from bot.helpers.drafting import PickError, BanError, VoteError, TeamDraft, MapVeto, MapVote, MatchTypeVote, CombinedVote
+from bot.helpers.tracing import get_trace, set_trace, span
+from bot.helpers.utils import get_locale, set_locale, translate
 
 
 EMOJI_NUMBERS = [u'\u0030\u20E3',
@@ -18,214 +23,392 @@ EMOJI_NUMBERS = [u'\u0030\u20E3',
                  u'\u0038\u20E3',
                  u'\u0039\u20E3',
                  u'\U0001F51F']
+PAGE_SIZE = len(EMOJI_NUMBERS) - 1  # Players per page of a paginated team draft
+PAGE_EMOJIS = {u'\u23EA': -1, u'\u23E9': 1}
+FIELD_LIMIT = 1024  # Maximum length of an embed field value
 
 
-class PickError(ValueError):
-    """ Raised when a team draft pick is invalid for some reason. """
+logger = logging.getLogger('csgoleague.menus')
 
-    def __init__(self, message):
-        """ Set message parameter. """
-        self.message = message
 
+class ReactionRouter:
+    """ Single reaction listener that routes reactions to the menu of the reacted message. """
 
-class TeamDraftMenu(discord.Message):
-    """ Message containing the components for a team draft. """
+    def __init__(self, bot):
+        """ Set attributes and listen for reactions. """
+        self.bot = bot
+        self.handlers = {}
+        self.bot.add_listener(self.on_reaction_add)
 
-    def __init__(self, message, bot, members):
-        """ Copy constructor from a message and specific team draft args. """
-        # Copy all attributes from message object
-        for attr_name in message.__slots__:
-            try:
-                attr_val = getattr(message, attr_name)
-            except AttributeError:
-                continue
+    async def on_reaction_add(self, reaction, member):
+        """ Hand the reaction to the menu listening on its message, if any. """
+        handler, locale, trace = self.handlers.get(reaction.message.id, (None, None, None))
+
+        if handler is not None:
+            set_locale(locale)  # Reactions are translated and traced like the rest of the menu
+            set_trace(trace)
+
+            with span('reaction', 'menu', emoji=str(reaction.emoji)):
+                await handler(reaction, member)
+
+    @contextmanager
+    def route(self, message_id, handler):
+        """ Route the reactions of a message to a handler until the block exits, even on error or timeout. """
+        route = (handler, get_locale(), get_trace())
+        self.handlers[message_id] = route
+
+        try:
+            with span(handler.__qualname__.split('.')[0], 'menu'):
+                yield
+        finally:
+            if self.handlers.get(message_id) == route:
+                del self.handlers[message_id]
+
+
+@lru_cache(maxsize=None)
+def _locale_text(locale, key, template):
+    """ Static text of the menu embeds formatted once per locale. """
+    return template.format(translate(key))
+
+
+def _text(key, template='{}'):
+    """ Translated static text of the menu embeds shared by every menu in the current locale. """
+    return _locale_text(get_locale(), key, template)
+
+
+def _number_emoji(num):
+    """ Number as a keycap emoji when there is one. """
+    return EMOJI_NUMBERS[num] if num < len(EMOJI_NUMBERS) else f'**{num}**'
 
-            setattr(self, attr_name, attr_val)
 
-        # Add custom attributes
+def _field_value(lines):
+    """ Join lines into an embed field value, cutting the lines that don't fit into a count. """
+    value = '\n'.join(lines)
+
+    if len(value) <= FIELD_LIMIT:
+        return value
+
+    kept = []
+    length = 0
+
+    for num, line in enumerate(lines):
+        more = f'_+{len(lines) - num}_'
+
+        if length + len(line) + len(more) + 2 > FIELD_LIMIT:
+            return '\n'.join(kept + [more])
+
+        kept.append(line)
+        length += len(line) + 1
+
+    return '\n'.join(kept)
+
+
+class Menu:
+    """ Lightweight handle on a menu message that only keeps its ID, channel and the menu state. """
+
+    __slots__ = ('bot', 'message', 'future', 'render_task', 'next_render', 'seed_task', 'turn_time', 'turn_deadline')
+
+    def __init__(self, message, bot):
+        """ Set attributes. """
         self.bot = bot
-        self.members = members
-        self.pick_emojis = dict(zip(EMOJI_NUMBERS[1:], members))
-        self.pick_order = '1' + '2211'*20
-        self.pick_number = None
-        self.members_left = None
-        self.players = None
-        self.teams = None
-        self.captains_emojis = None
+        self.message = message.channel.get_partial_message(message.id)
         self.future = None
+        self.render_task = None
+        self.next_render = None
+        self.seed_task = None
+        self.turn_time = None
+        self.turn_deadline = None
 
     @property
-    def _active_picker(self):
-        """ Get the active picker using the pick order and nummber. """
-        if self.pick_number is None:
-            return None
+    def id(self):
+        """ ID of the menu message. """
+        return self.message.id
+
+    @property
+    def channel(self):
+        """ Channel of the menu message. """
+        return self.message.channel
+
+    @property
+    def guild(self):
+        """ Guild of the menu message. """
+        return self.message.guild
+
+    def _is_own(self, member):
+        """ Check if a reaction comes from the bot itself. """
+        return member.id == self.bot.user.id
+
+    def _embed(self, title=discord.Embed.Empty, footer=None, description=discord.Embed.Empty):
+        """ Build a menu embed from the bot template with a shared, cached footer. """
+        embed = self.bot.embed_template(title=title, description=description)
+
+        if footer is not None:
+            embed.set_footer(text=_text(footer))
+
+        return embed
+
+    async def edit(self, **fields):
+        """ Edit the menu message. """
+        await self.message.edit(**fields)
+
+    def render(self, build_embed):
+        """ Schedule an edit of the menu embed, coalescing the renders requested while an edit is in flight. """
+        self.next_render = build_embed
+
+        if self.render_task is None or self.render_task.done():
+            self.render_task = self.bot.loop.create_task(self._flush_renders())
 
-        picking_team_number = int(self.pick_order[self.pick_number])
-        picking_team = self.teams[picking_team_number - 1]  # Subtract 1 to get team's index
+    async def _flush_renders(self):
+        """ Keep editing the message with the latest requested embed until no render is pending. """
+        while self.next_render is not None:
+            build_embed, self.next_render = self.next_render, None
+
+            try:
+                await self.edit(embed=build_embed())
+            except discord.HTTPException:
+                logger.exception(f'Unable to render menu {self.id}')
+
+    def seed_reactions(self, emojis):
+        """ Add the reaction buttons in the background while the menu already listens for reactions. """
+        self.seed_task = self.bot.loop.create_task(self._add_reactions(emojis))
+
+    async def _add_reactions(self, emojis):
+        """ Add the reactions one by one in priority order, the emojis can be a lazy iterable of the ones still needed. """
+        for emoji in emojis:
+            try:
+                await self.add_reaction(emoji)
+            except discord.HTTPException:
+                logger.exception(f'Unable to add reaction {emoji} to menu {self.id}')
+                return
+
+    async def _settle(self):
+        """ Stop seeding reactions and wait for the renders to flush, so the latest state is shown. """
+        if self.seed_task is not None:
+            self.seed_task.cancel()
+            self.seed_task = None
+
+        if self.render_task is not None:
+            await self.render_task
+            self.render_task = None
+
+    def _next_turn(self):
+        """ Restart the turn timer. """
+        self.turn_deadline = self.bot.loop.time() + self.turn_time
+
+    async def _wait_turns(self, timeout_turn):
+        """ Wait for the menu to finish, playing the turn of a player whose time ran out. """
+        self._next_turn()
+
+        while not self.future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self.future), self.turn_deadline - self.bot.loop.time())
+            except asyncio.TimeoutError:
+                if self.bot.loop.time() >= self.turn_deadline:
+                    await timeout_turn()
+                    self._next_turn()
+
+    async def add_reaction(self, emoji):
+        """ Add a reaction to the menu message. """
+        await self.message.add_reaction(emoji)
+
+    async def remove_reaction(self, emoji, member):
+        """ Remove a member's reaction from the menu message. """
+        await self.message.remove_reaction(emoji, member)
+
+    async def clear_reaction(self, emoji):
+        """ Clear all the reactions of an emoji from the menu message. """
+        await self.message.clear_reaction(emoji)
+
+    async def clear_reactions(self):
+        """ Clear all the reactions from the menu message. """
+        await self.message.clear_reactions()
+
+    def _resolve(self, result=None):
+        """ Let the menu's waiting coroutine finish. """
+        if self.future is not None:
+            try:
+                self.future.set_result(result)
+            except asyncio.InvalidStateError:
+                pass
 
-        if len(picking_team) == 0:
+
+class TeamDraftMenu(Menu):
+    """ Message containing the components for a team draft, paginated with a keypad for large lobbies. """
+
+    __slots__ = ('members', 'paged', 'pick_emojis', 'member_emojis', 'players', 'scores', 'state', 'page',
+                 'num_pages', 'page_fields', 'rendered_picks')
+
+    def __init__(self, message, bot, members):
+        """ Set the menu message and specific team draft args. """
+        super().__init__(message, bot)
+        self.members = members
+        self.paged = len(members) > PAGE_SIZE
+        self.pick_emojis = dict(zip(EMOJI_NUMBERS[1:], range(PAGE_SIZE)))  # Emoji to index on the page
+        # Small lobbies clear the reaction of every player picked, the keypad of large ones stays
+        self.member_emojis = {} if self.paged else dict(zip(members, EMOJI_NUMBERS[1:]))
+        self.players = None
+        self.scores = None
+        self.state = None
+        self.page = 0
+        self.num_pages = (len(members) - 1) // PAGE_SIZE + 1
+        self.page_fields = {}
+        self.rendered_picks = 0
+
+    def _pick_for(self, emoji):
+        """ Get the member under a keypad emoji on the current page. """
+        index = self.pick_emojis.get(emoji)
+
+        if index is None:
             return None
 
-        return picking_team[0]
+        index += self.page * PAGE_SIZE
+        return self.members[index] if index < len(self.members) else None
+
+    def _page_field(self, page):
+        """ Players list of a page, cached until one of its players is picked. """
+        # Invalidate the pages of the players picked since the last render
+        for member in self.state.picked[self.rendered_picks:]:
+            self.page_fields.pop(self.state.index[member] // PAGE_SIZE, None)
+
+        self.rendered_picks = len(self.state.picked)
+
+        if page not in self.page_fields:
+            lines = []
+
+            for index in range(page * PAGE_SIZE, min((page + 1) * PAGE_SIZE, len(self.members))):
+                member = self.members[index]
+                player = self.players[index]
+
+                if member in self.state.left:
+                    lines.append(f'{EMOJI_NUMBERS[index % PAGE_SIZE + 1]}  [{member.display_name}]'
+                                 f'({player.league_profile})  |  {player.score}')
+                else:
+                    lines.append(f':heavy_multiplication_x:  ~~[{member.display_name}]({player.league_profile})~~')
+
+            self.page_fields[page] = _field_value(lines)
+
+        return self.page_fields[page]
 
     def _picker_embed(self, title):
         """ Generate the menu embed based on the current status of the team draft. """
-        embed = self.bot.embed_template(title=title)
-        embed.set_footer(text=translate('team-pick-footer'))
+        embed = self._embed(title, 'team-pick-page-footer' if self.paged else 'team-pick-footer')
+        teams = self.state.teams
 
-        for team in self.teams:
-            team_name = f'__{translate("team")}__' if len(
-                team) == 0 else f'__{translate("team")} {team[0].display_name}__'
+        for team in teams:
+            team_name = _text('team', '__{}__') if len(
+                team) == 0 else f'__{_text("team")} {team[0].display_name}__'
 
             if len(team) == 0:
-                team_players = f'_{translate("empty")}_'
+                team_players = _text('empty', '_{}_')
             else:
-                team_players = '\n'.join(p.display_name for p in team)
+                team_players = _field_value([p.display_name for p in team])
 
             embed.add_field(name=team_name, value=team_players)
 
-        members_left_str = ''
+        players_left_name = _text('players-left', '__{}__')
 
-        for index, (emoji, member) in enumerate(self.pick_emojis.items()):
-            if not any(member in team for team in self.teams):
-                members_left_str += f'{emoji}  [{member.display_name}]({self.players[index].league_profile})  |  {self.players[index].score}\n'
-            else:
-                members_left_str += f':heavy_multiplication_x:  ~~[{member.display_name}]({self.players[index].league_profile})~~\n'
+        if self.paged:
+            players_left_name += f' ({self.page + 1}/{self.num_pages})'
 
-        embed.insert_field_at(1, name=f'__{translate("players-left")}__', value=members_left_str)
+        embed.insert_field_at(1, name=players_left_name, value=self._page_field(self.page))
 
         status_str = ''
+        active_picker = self.state.active_captain if not self.state.done else None
 
-        status_str += f'**{translate("capt1")}:** {self.teams[0][0].mention}\n' if len(
-            self.teams[0]) else f'**{translate("capt1")}:**\n '
-        status_str += f'**{translate("capt2")}:** {self.teams[1][0].mention}\n\n' if len(
-            self.teams[1]) else f'**{translate("capt2")}:**\n\n '
-        status_str += f'**{translate("current-capt")}:** {self._active_picker.mention}' \
-            if self._active_picker is not None else f'**{translate("current-capt")}:**'
+        status_str += f'{_text("capt1", "**{}:**")} {teams[0][0].mention}\n' if len(
+            teams[0]) else f'{_text("capt1", "**{}:**")}\n '
+        status_str += f'{_text("capt2", "**{}:**")} {teams[1][0].mention}\n\n' if len(
+            teams[1]) else f'{_text("capt2", "**{}:**")}\n\n '
+        status_str += f'{_text("current-capt", "**{}:**")} {active_picker.mention}' \
+            if active_picker is not None else _text('current-capt', '**{}:**')
 
-        embed.add_field(name=f'__{translate("info")}__', value=status_str)
+        embed.add_field(name=_text('info', '__{}__'), value=status_str)
         return embed
 
-    def _pick_player(self, picker, pickee):
-        """ Process a team captain's player pick, assuming the picker is in the team draft. """
-        # Get picking team
-        if picker == pickee:
-            raise PickError(translate('picker-pick-self', picker.display_name))
-        elif not self.teams[0]:
-            picking_team = self.teams[0]
-            self.captains_emojis.append(list(self.pick_emojis.keys())[list(self.pick_emojis.values()).index(picker)])
-            self.members_left.remove(picker)
-            picking_team.append(picker)
-        elif self.teams[1] == [] and picker == self.teams[0][0]:
-            raise PickError(translate('picker-not-turn', picker.display_name))
-        elif self.teams[1] == [] and picker in self.teams[0]:
-            raise PickError(translate('picker-not-captain', picker.display_name))
-        elif not self.teams[1]:
-            picking_team = self.teams[1]
-            self.captains_emojis.append(list(self.pick_emojis.keys())[list(self.pick_emojis.values()).index(picker)])
-            self.members_left.remove(picker)
-            picking_team.append(picker)
-        elif picker == self.teams[0][0]:
-            picking_team = self.teams[0]
-        elif picker == self.teams[1][0]:
-            picking_team = self.teams[1]
-        else:
-            raise PickError(translate('picker-not-captain', picker.display_name))
-
-        # Check if it's picker's turn
-        if picker != self._active_picker:
-            raise PickError(translate('picker-not-turn', picker.display_name))
-
-        # Prevent picks when team is full
-        if len(picking_team) > len(self.members) // 2:
-            raise PickError(translate('team-full', picker.display_name))
-
-        self.members_left.remove(pickee)
-        picking_team.append(pickee)
-        self.pick_number += 1
+    async def _process_pick(self, reaction, member):
+        """ Handler function for player pick and page reactions. """
+        # Check that the reaction isn't the bot's own
+        if self._is_own(member):
+            return
 
-    async def _update_menu(self, title):
-        """ Update the message to reflect the current status of the team draft. """
-        await self.edit(embed=self._picker_embed(title))
+        emoji = str(reaction.emoji)
 
-    async def _process_pick(self, reaction, member):
-        """ Handler function for player pick reactions. """
-        # Check that reaction is on this message and member is in the team draft
-        if reaction.message.id != self.id or member == self.author:
+        # Any player of the draft can flip the pages of the players list
+        if emoji in PAGE_EMOJIS and self.paged and member in self.state.index:
+            self.page = (self.page + PAGE_EMOJIS[emoji]) % self.num_pages
+            await self.remove_reaction(reaction, member)
+            self.render(partial(self._picker_embed, translate('team-draft-page', self.page + 1, self.num_pages)))
             return
 
         # Check that picked player is in the player pool
-        pick = self.pick_emojis.get(str(reaction.emoji), None)
+        pick = self._pick_for(emoji)
 
-        if pick is None or pick not in self.members_left or member not in self.members:
+        if pick is None or pick not in self.state.left or member not in self.state.index:
             await self.remove_reaction(reaction, member)
             return
 
+        captains = self.state.captains
+
         # Attempt to pick the player for the team
         try:
-            self._pick_player(member, pick)
+            self.state.pick(member, pick)
         except PickError as e:  # Player not picked
             await self.remove_reaction(reaction, member)
-            title = e.message
-        else:  # Player picked 
-            await self.clear_reaction(reaction.emoji)
+            title = translate(e.reason, member.display_name)
+        else:  # Player picked
+            self._next_turn()
+
+            if self.paged:
+                await self.remove_reaction(reaction, member)
+            else:
+                await self.clear_reaction(reaction.emoji)
+
             title = translate('team-picked', member.display_name, pick.display_name)
 
-        if len(self.members) - len(self.members_left) == 2:
-            await self.clear_reaction(self.captains_emojis[0])
-        elif len(self.members) - len(self.members_left) == 4:
-            await self.clear_reaction(self.captains_emojis[1])
+        await self._clear_new_captains(captains)
+        self.render(partial(self._picker_embed, title))
 
-        if len(self.members_left) == 1:
-            fat_kid_team = self.teams[0] if len(self.teams[0]) <= len(self.teams[1]) else self.teams[1]
-            fat_kid_team.append(self.members_left.pop(0))
-            await self._update_menu(title)
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
-            return
+        if self.state.done:
+            self._resolve()
 
-        if len(self.members_left) == 0:
-            await self._update_menu(title)
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
+    async def _clear_new_captains(self, captains):
+        """ Volunteers can't be picked anymore once they become captains. """
+        for captain in self.state.captains:
+            if captain is not None and captain not in captains and captain in self.member_emojis:
+                await self.clear_reaction(self.member_emojis[captain])
+
+    async def _timeout_turn(self):
+        """ Pick the best player left for the captain who ran out of time. """
+        if self.state.done:
             return
 
-        await self._update_menu(title)
+        captains = self.state.captains
+        captain, pick = self.state.auto_pick(lambda member: self.scores.get(member, 0))
+
+        if pick in self.member_emojis:
+            await self.clear_reaction(self.member_emojis[pick])
+
+        await self._clear_new_captains(captains)
+        self.render(partial(self._picker_embed, translate('team-auto-picked', captain.display_name, pick.display_name)))
+
+        if self.state.done:
+            self._resolve()
 
     async def draft(self):
         """ Start the team draft and return the teams after it's finished. """
-        # Initialize 
-        self.members_left = self.members.copy()  # Copy members to edit players remaining in the player pool
+        # Initialize
+        self.state = TeamDraft(self.members)
         self.players = await self.bot.api_helper.get_players([member.id for member in self.members])
-        self.teams = [[], []]
-        self.pick_number = 0
-        self.captains_emojis = []
+        self.scores = {member: player.score for member, player in zip(self.members, self.players)}
+        self.turn_time = await self.bot.get_pug_data(self.channel.category, 'turn_time')
         captain_method = await self.bot.get_pug_data(self.channel.category, 'captain_method')
 
         if captain_method == 'rank':
-            players = await self.bot.api_helper.get_players([member.id for member in self.members_left])
-            players.sort(reverse=True, key=lambda x: x.score)
-
-            for team in self.teams:
-                captain = self.guild.get_member(players.pop(0).discord)
-                self.members_left.remove(captain)
-                team.append(captain)
-                self.captains_emojis.append(list(self.pick_emojis.keys())[list(self.pick_emojis.values()).index(captain)])
+            self.state.set_captains(*sorted(self.members, key=lambda member: self.scores.get(member, 0), reverse=True)[:2])
         elif captain_method == 'random':
-            temp_members = self.members_left.copy()
+            temp_members = self.members.copy()
             shuffle(temp_members)
-
-            for team in self.teams:
-                captain = temp_members.pop()
-                self.members_left.remove(captain)
-                team.append(captain)
-                self.captains_emojis.append(list(self.pick_emojis.keys())[list(self.pick_emojis.values()).index(captain)])
+            self.state.set_captains(temp_members.pop(), temp_members.pop())
         elif captain_method == 'volunteer':
             pass
         else:
@@ -233,160 +416,164 @@ class TeamDraftMenu(discord.Message):
 
         await self.edit(embed=self._picker_embed(translate('team-draft-begun')))
 
-        items = self.pick_emojis.items()
-        for emoji, member in items:
-            if member in self.members_left:
-                await self.add_reaction(emoji)
-
         # Add listener handlers and wait until there are no members left to pick
         self.future = self.bot.loop.create_future()
-        self.bot.add_listener(self._process_pick, name='on_reaction_add')
-        await asyncio.wait_for(self.future, 600)
-        self.bot.remove_listener(self._process_pick, name='on_reaction_add')
-
-        return self.teams
 
+        with self.bot.reaction_router.route(self.id, self._process_pick):
+            if self.paged:
+                # The whole keypad is needed on every page
+                self.seed_reactions(list(PAGE_EMOJIS) + list(self.pick_emojis))
+            else:
+                # Seed the best players first, skipping the ones picked in the meantime
+                ranked = sorted(self.member_emojis.items(), key=lambda x: self.scores.get(x[0], 0), reverse=True)
+                self.seed_reactions(emoji for member, emoji in ranked if member in self.state.left)
 
-class MapVetoMenu(discord.Message):
-    """ Message containing the components for a map veto. """
+            if self.state.done:
+                self._resolve()
 
-    def __init__(self, message, bot):
-        """"""
-        # Copy all attributes from message object
-        for attr_name in message.__slots__:
             try:
-                attr_val = getattr(message, attr_name)
-            except AttributeError:
-                continue
+                await self._wait_turns(self._timeout_turn)
+            finally:
+                await self._settle()
 
-            setattr(self, attr_name, attr_val)
+        return [list(team) for team in self.state.teams]
 
-        # Add custom attributes 
-        self.bot = bot
-        self.ban_order = '12' * 20
-        self.num_maps = 1
-        self.captains = None
-        self.map_pool = None
-        self.maps_left = None
-        self.ban_number = None
-        self.future = None
 
-    @property
-    def _active_picker(self):
-        """ Get the active picker using the pick order and nummber. """
-        if self.ban_number is None or self.captains is None:
-            return None
+class MapVetoMenu(Menu):
+    """ Message containing the components for a map veto. """
+
+    __slots__ = ('emoji_maps', 'ban_rates', 'state')
 
-        picking_player_number = int(self.ban_order[self.ban_number])
-        return self.captains[picking_player_number - 1]  # Subtract 1 to get picker's index
+    def __init__(self, message, bot):
+        """ Set the menu message and specific map veto args. """
+        super().__init__(message, bot)
+        self.emoji_maps = None
+        self.ban_rates = None
+        self.state = None
 
     def _veto_embed(self, title):
         """ Generate the menu embed based on the current status of the map bans. """
-        embed = self.bot.embed_template(title=title)
-        embed.set_footer(text=translate('map-veto-footer'))
+        embed = self._embed(title, 'map-veto-footer')
         maps_str = ''
 
-        if self.map_pool is not None and self.maps_left is not None:
-            for m in self.map_pool:
-                maps_str += f'{m.emoji}  {m.name}\n' if m.emoji in self.maps_left else f':heavy_multiplication_x:  ' \
+        if self.state is not None:
+            for m in self.state.pool:
+                maps_str += f'{m.emoji}  {m.name}\n' if m in self.state.maps_left else f':heavy_multiplication_x:  ' \
                             f'~~{m.name}~~\n '
 
         status_str = ''
 
-        if self.captains is not None and self._active_picker is not None:
-            status_str += f'**{translate("capt1")}:** {self.captains[0].mention}\n'
-            status_str += f'**{translate("capt2")}:** {self.captains[1].mention}\n\n'
-            status_str += f'**{translate("current-capt")}:** {self._active_picker.mention}'
+        if self.state is not None and not self.state.done:
+            status_str += f'{_text("capt1", "**{}:**")} {self.state.captains[0].mention}\n'
+            status_str += f'{_text("capt2", "**{}:**")} {self.state.captains[1].mention}\n\n'
+            status_str += f'{_text("current-capt", "**{}:**")} {self.state.active_captain.mention}'
 
-        embed.add_field(name=f'__{translate("maps-left")}__', value=maps_str)
-        embed.add_field(name=f'__{translate("info")}__', value=status_str)
+        embed.add_field(name=_text('maps-left', '__{}__'), value=maps_str)
+        embed.add_field(name=_text('info', '__{}__'), value=status_str)
         return embed
 
     async def _process_ban(self, reaction, member):
         """ Handler function for map ban reactions. """
-        # Check that reaction is on this message
-        if reaction.message.id != self.id or member == self.author:
+        # Check that the reaction isn't the bot's own or late for a veto that is over
+        if self._is_own(member) or self.state.done:
             return
 
-        if member not in self.captains or str(reaction) not in [m for m in self.maps_left] or member != self._active_picker:
-            await self.remove_reaction(reaction, member)
-            return
+        map_ban = self.emoji_maps.get(str(reaction))
+
         # Ban map if the emoji is valid
         try:
-            map_ban = self.maps_left.pop(str(reaction))
-        except KeyError:
+            self.state.ban(member, map_ban)
+        except BanError:
+            await self.remove_reaction(reaction, member)
             return
 
-        self.ban_number += 1
+        self._next_turn()
         # Clear banned map reaction
         await self.clear_reaction(map_ban.emoji)
         # Edit message
-        embed = self._veto_embed(translate('user-banned-map', member.display_name, map_ban.name))
-        await self.edit(embed=embed)
+        self.render(partial(self._veto_embed, translate('user-banned-map', member.display_name, map_ban.name)))
 
         # Check if the veto is over
-        if len(self.maps_left) == self.num_maps:
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
+        if self.state.done:
+            self._resolve()
+
+    async def _timeout_turn(self):
+        """ Ban the map banned the most in the past for the captain who ran out of time. """
+        if self.state.done:
+            return
+
+        captain, map_ban = self.state.auto_ban(lambda m: self.ban_rates.get(m.dev_name, 0))
+        await self.clear_reaction(map_ban.emoji)
+        self.render(partial(self._veto_embed, translate('map-auto-banned', captain.display_name, map_ban.name)))
+
+        if self.state.done:
+            self._resolve()
 
     async def veto(self, pool, captain_1, captain_2, num_maps):
         """"""
         # Initialize veto
-        self.captains = [captain_1, captain_2]
-        self.map_pool = pool
-        self.maps_left = {m.emoji: m for m in self.map_pool}
-        self.ban_number = 0
-        self.num_maps = num_maps
-
-        if len(self.map_pool) % 2 == 0:
-            self.captains.reverse()
+        self.state = MapVeto(pool, [captain_1, captain_2], num_maps)
+        self.emoji_maps = {m.emoji: m for m in pool}
+        self.ban_rates = await self.bot.db_helper.get_ban_rates(self.channel.category.id)
+        self.turn_time = await self.bot.get_pug_data(self.channel.category, 'turn_time')
 
         # Edit input message and add emoji button reactions
         await self.edit(embed=self._veto_embed(translate('map-bans-begun')))
 
-        for m in self.map_pool:
-            await self.add_reaction(m.emoji)
-
         # Add listener handlers and wait until there are no maps left to ban
         self.future = self.bot.loop.create_future()
-        self.bot.add_listener(self._process_ban, name='on_reaction_add')
-        await asyncio.wait_for(self.future, 600)
-        self.bot.remove_listener(self._process_ban, name='on_reaction_add')
+
+        with self.bot.reaction_router.route(self.id, self._process_ban):
+            self.seed_reactions(m.emoji for m in self.state.pool if m in self.state.maps_left)
+
+            if self.state.done:
+                self._resolve()
+
+            try:
+                await self._wait_turns(self._timeout_turn)
+            finally:
+                await self._settle()
+
         await self.clear_reactions()
 
-        picked_maps = list(self.maps_left.values())
+        # Only the captains' own bans go into the history the automatic bans rely on
+        await self.bot.db_helper.insert_map_bans(self.channel.category.id,
+                                                 [m.dev_name for m in self.state.pool],
+                                                 [m.dev_name for m in self.state.pool
+                                                  if m not in self.state.maps_left and m not in self.state.auto_bans])
+
+        picked_maps = self.state.result()
         shuffle(picked_maps)
 
         return picked_maps
 
 
-class ReadyMenu(discord.Message):
-    def __init__(self, message, bot, members):
-        """"""
-        # Copy all attributes from message object
-        for attr_name in message.__slots__:
-            try:
-                attr_val = getattr(message, attr_name)
-            except AttributeError:
-                continue
+class ReadyMenu(Menu):
+    """ Message containing the components for the queue ready check. """
 
-            setattr(self, attr_name, attr_val)
+    __slots__ = ('members', 'reactors', 'players')
 
-        # Add custom attributes
-        self.bot = bot
+    def __init__(self, message, bot, members):
+        """ Set the menu message and specific ready check args. """
+        super().__init__(message, bot)
         self.members = members
         self.reactors = None
-        self.future = None
         self.players = None
 
     def _ready_embed(self):
         """ Generate the menu embed based on the current ready status of players. """
         str_value = ''
-        description = translate('react-ready', '✅')
-        embed = self.bot.embed_template(title=translate('queue-filled'), description=description)
+        embed = self._embed(_text('queue-filled'), description=_text('react-ready').format('✅'))
+
+        if len(self.members) > PAGE_SIZE:
+            # Large lobbies are listed without profile links in fields of one page each to fit in the embed
+            for start in range(0, len(self.members), PAGE_SIZE):
+                lines = [f'{"✅" if member in self.reactors else ":heavy_multiplication_x:"}  {num}. {member.display_name}'
+                         for num, member in enumerate(self.members[start:start + PAGE_SIZE], start=start + 1)]
+                embed.add_field(name=_text('player', ':hourglass: __{}__') if start == 0 else '\u200b',
+                                value=_field_value(lines))
+
+            return embed
 
         for num, member in enumerate(self.members, start=1):
             if member not in self.reactors:
@@ -394,14 +581,14 @@ class ReadyMenu(discord.Message):
             else:
                 str_value += f'✅  {num}. [{member.display_name}]({self.players[num-1].league_profile})\n '
 
-        embed.add_field(name=f":hourglass: __{translate('player')}__",
+        embed.add_field(name=_text('player', ':hourglass: __{}__'),
                         value='-------------------\n' + str_value)
         return embed
 
     async def _process_ready(self, reaction, member):
         """ Track who has readied up. """
-        # Check if this is a message we care about
-        if reaction.message.id != self.id or member == self.author:
+        # Check that the reaction isn't the bot's own
+        if self._is_own(member):
             return
         # Check if this is a member and reaction we care about
         if member not in self.members or reaction.emoji != '✅':
@@ -409,14 +596,10 @@ class ReadyMenu(discord.Message):
             return
 
         self.reactors.add(member)
-        await self.edit(embed=self._ready_embed())
+        self.render(self._ready_embed)
 
         if self.reactors.issuperset(self.members):
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
+            self._resolve()
 
     async def ready_up(self):
         """"""
@@ -424,219 +607,239 @@ class ReadyMenu(discord.Message):
         self.future = self.bot.loop.create_future()
         self.players = await self.bot.api_helper.get_players([member.id for member in self.members])
         await self.edit(embed=self._ready_embed())
-        await self.add_reaction('✅')
 
-        self.bot.add_listener(self._process_ready, name='on_reaction_add')
-        try:
-            await asyncio.wait_for(self.future, 60)
-        except asyncio.TimeoutError:
-            pass
+        with self.bot.reaction_router.route(self.id, self._process_ready):
+            self.seed_reactions(['✅'])
+
+            try:
+                await asyncio.wait_for(self.future, 60)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                await self._settle()
 
-        self.bot.remove_listener(self._process_ready, name='on_reaction_add')
-        
         return self.reactors
 
 
-class MapVoteMenu(discord.Message):
-    """"""
+class MapVoteMenu(Menu):
+    """ Message containing the components for a map vote. """
 
-    def __init__(self, message, bot, members):
-        """"""
-        # Copy all attributes from message object
-        for attr_name in message.__slots__:
-            try:
-                attr_val = getattr(message, attr_name)
-            except AttributeError:
-                continue
-
-            setattr(self, attr_name, attr_val)
+    __slots__ = ('members', 'emoji_maps', 'state')
 
-        # Add custom attributes
-        self.bot = bot
+    def __init__(self, message, bot, members):
+        """ Set the menu message and specific map vote args. """
+        super().__init__(message, bot)
         self.members = members
-        self.voted_members = None
-        self.map_pool = None
-        self.map_votes = None
-        self.future = None
-        self.tie_count = 0
+        self.emoji_maps = None
+        self.state = None
 
     def _vote_embed(self):
-        embed = self.bot.embed_template(title=translate('vote-map-started'))
+        embed = self._embed(_text('vote-map-started'), 'vote-map-footer')
+        votes = self.state.votes
+        top = self.state.top
         str_value = '--------------------\n'
         str_value += '\n'.join(
-            f'{EMOJI_NUMBERS[self.map_votes[m.emoji]]} {m.emoji} {m.name} '
-            f'{":small_orange_diamond:" if self.map_votes[m.emoji] == max(self.map_votes.values()) and self.map_votes[m.emoji] != 0 else ""} '
-            for m in self.map_pool)
-        embed.add_field(name=f':repeat_one: :map: __{translate("maps")}__', value=str_value)
-        embed.set_footer(text=translate('vote-map-footer'))
+            f'{_number_emoji(votes[m])} {m.emoji} {m.name} '
+            f'{":small_orange_diamond:" if votes[m] == top and votes[m] != 0 else ""} '
+            for m in self.state.pool)
+        embed.add_field(name=_text('maps', ':repeat_one: :map: __{}__'), value=str_value)
         return embed
 
     async def _process_vote(self, reaction, member):
         """"""
-        # Check that reaction is on this message and user is not the bot
-        if reaction.message.id != self.id or member == self.author:
+        # Check that the reaction isn't the bot's own
+        if self._is_own(member):
             return
 
-        if member not in self.members or member in self.voted_members or str(reaction) not in [m.emoji for m in self.map_pool]:
+        # Add map vote if it is valid
+        try:
+            self.state.vote(member, self.emoji_maps.get(str(reaction)))
+        except VoteError:
             await self.remove_reaction(reaction, member)
             return
 
-        # Add map vote if it is valid
-        self.map_votes[str(reaction)] += 1
-
-        self.voted_members[member] = str(reaction)
-        await self.edit(embed=self._vote_embed())
+        self.render(self._vote_embed)
         # Check if the voting is over
-        if len(self.voted_members) == len(self.members):
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
+        if self.state.done:
+            self._resolve()
 
     async def vote(self, mpool):
         """"""
-        self.voted_members = {}
-        self.map_pool = mpool
-        self.map_votes = {m.emoji: 0 for m in self.map_pool}
-        await self.edit(embed=self._vote_embed())
+        self.state = MapVote(mpool, self.members)
+        self.emoji_maps = {m.emoji: m for m in mpool}
 
-        for m in self.map_pool:
-            await self.add_reaction(m.emoji)
+        # Tied maps go to another round until there is a winner
+        while True:
+            await self.edit(embed=self._vote_embed())
 
-        # Add listener handlers and wait until there are no maps left to ban
-        self.future = self.bot.loop.create_future()
-        self.bot.add_listener(self._process_vote, name='on_reaction_add')
+            # Add listener handlers and wait until everyone voted
+            self.future = self.bot.loop.create_future()
 
-        try:
-            await asyncio.wait_for(self.future, 60)
-        except asyncio.TimeoutError:
-            pass
+            with self.bot.reaction_router.route(self.id, self._process_vote):
+                self.seed_reactions([m.emoji for m in self.state.pool])
 
-        self.bot.remove_listener(self._process_vote, name='on_reaction_add')
-        try:
-            await self.clear_reactions()
-        except discord.errors.NotFound:
-            pass
+                try:
+                    await asyncio.wait_for(self.future, 60)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    await self._settle()
 
-        # Gather results
-        winners_emoji = []
-        winners_votes = 0
+            self.future = None
 
-        for emoji, votes in self.map_votes.items():
-            if votes > winners_votes:
-                winners_emoji.clear()
-                winners_emoji.append(emoji)
-                winners_votes = votes
-            elif votes == winners_votes:
-                winners_emoji.append(emoji)
+            try:
+                await self.clear_reactions()
+            except discord.errors.NotFound:
+                pass
 
-        self.map_pool = [m for m in mpool if m.emoji in winners_emoji]
+            winners = self.state.close_round()
 
-        # Return class to original state after map veto is done
-        self.voted_members = None
-        self.map_votes = None
-        self.future = None
+            if winners is not None:
+                return winners
 
-        if len(winners_emoji) == 1:
-            return self.map_pool
-        elif len(winners_emoji) == 2 and self.tie_count == 1:
-            return [choice(self.map_pool)]
-        else:
-            if len(winners_emoji) == 2:
-                self.tie_count += 1
-            return await self.vote(self.map_pool)
 
+class MatchTypeVoteMenu(Menu):
+    """ Message containing the components for the captains match type vote. """
 
-class MatchTypeVoteMenu(discord.Message):
-    """"""
+    __slots__ = ('numbers', 'captains', 'state')
 
     def __init__(self, message, bot, captains):
-        """"""
-        # Copy all attributes from message object
-        for attr_name in message.__slots__:
-            try:
-                attr_val = getattr(message, attr_name)
-            except AttributeError:
-                continue
-
-            setattr(self, attr_name, attr_val)
-
-        # Add custom attributes
-        self.bot = bot
-        self.numbers = EMOJI_NUMBERS[1:4]
+        """ Set the menu message and specific match type vote args. """
+        super().__init__(message, bot)
+        self.numbers = {num: index for index, num in enumerate(EMOJI_NUMBERS[1:4], start=1)}
         self.captains = captains
-        self.voted_captains = {}
-        self.future = None
+        self.state = None
 
     def _vote_embed(self):
-        embed = self.bot.embed_template(title='Captains vote for number of maps')
+        embed = self._embed('Captains vote for number of maps', 'vote-match-type-footer')
+        votes = self.state.votes
+        top = self.state.top
         str_value = '------------\n'
         str_value += '\n'.join(
-            f'{num}  Bo{self.numbers.index(num) + 1}'
-            f'{":small_orange_diamond:" if self.num_votes[num] == max(self.num_votes.values()) and self.num_votes[num] != 0 else ""} '
-            for num in self.numbers)
-        embed.add_field(name=f':repeat_one:  __' + translate("match-type") + '__', value=str_value)
-        embed.set_footer(text=translate('vote-match-type-footer'))
+            f'{num}  Bo{option}'
+            f'{":small_orange_diamond:" if votes[option] == top and votes[option] != 0 else ""} '
+            for num, option in self.numbers.items())
+        embed.add_field(name=_text('match-type', ':repeat_one:  __{}__'), value=str_value)
         return embed
 
     async def _process_vote(self, reaction, member):
         """"""
-        # Check that reaction is on this message and user is not the bot
-        if reaction.message.id != self.id or member == self.author:
+        # Check that the reaction isn't the bot's own
+        if self._is_own(member):
             return
 
-        if member not in self.captains or member in self.voted_captains or str(reaction) not in self.numbers:
+        try:
+            self.state.vote(member, self.numbers.get(str(reaction)))
+        except VoteError:
             await self.remove_reaction(reaction, member)
             return
 
-        self.num_votes[str(reaction)] += 1
-
-        self.voted_captains[member] = str(reaction)
-        await self.edit(embed=self._vote_embed())
+        self.render(self._vote_embed)
         # Check if the voting is over
-        if len(self.voted_captains) == len(self.captains):
-            if self.future is not None:
-                try:
-                    self.future.set_result(None)
-                except asyncio.InvalidStateError:
-                    pass
+        if self.state.done:
+            self._resolve()
 
     async def vote(self):
         """"""
-        self.num_votes = {num: 0 for num in self.numbers}
+        self.state = MatchTypeVote(self.captains, self.numbers.values())
         await self.edit(embed=self._vote_embed())
+        self.future = self.bot.loop.create_future()
 
-        for num in self.numbers:
-            await self.add_reaction(num)
+        with self.bot.reaction_router.route(self.id, self._process_vote):
+            self.seed_reactions(list(self.numbers))
 
-        self.future = self.bot.loop.create_future()
-        self.bot.add_listener(self._process_vote, name='on_reaction_add')
+            try:
+                await asyncio.wait_for(self.future, 60)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                await self._settle()
 
         try:
-            await asyncio.wait_for(self.future, 60)
-        except asyncio.TimeoutError:
+            await self.clear_reactions()
+        except discord.errors.NotFound:
             pass
 
-        self.bot.remove_listener(self._process_vote, name='on_reaction_add')
+        # Force set Bo1 if no captains voted
+        return self.state.result()
+
+
+class CombinedVoteMenu(Menu):
+    """ Message containing the components for the captains match type vote and the map vote at once. """
+
+    __slots__ = ('numbers', 'members', 'captains', 'emoji_maps', 'state')
+
+    def __init__(self, message, bot, members, captains):
+        """ Set the menu message and specific combined vote args. """
+        super().__init__(message, bot)
+        self.numbers = {num: index for index, num in enumerate(EMOJI_NUMBERS[1:4], start=1)}
+        self.members = members
+        self.captains = captains
+        self.emoji_maps = None
+        self.state = None
+
+    def _vote_embed(self):
+        embed = self._embed(_text('combined-vote-started'), 'vote-combined-footer')
+        type_votes = self.state.match_type.votes
+        type_top = self.state.match_type.top
+        map_votes = self.state.maps.votes
+        map_top = self.state.maps.top
+        type_value = '------------\n'
+        type_value += '\n'.join(
+            f'{num}  Bo{option}'
+            f'{":small_orange_diamond:" if type_votes[option] == type_top and type_votes[option] != 0 else ""} '
+            for num, option in self.numbers.items())
+        map_value = '--------------------\n'
+        map_value += '\n'.join(
+            f'{_number_emoji(map_votes[m])} {m.emoji} {m.name} '
+            f'{":small_orange_diamond:" if map_votes[m] == map_top and map_votes[m] != 0 else ""} '
+            for m in self.state.maps.pool)
+        embed.add_field(name=_text('match-type', ':repeat_one:  __{}__'), value=type_value)
+        embed.add_field(name=_text('maps', ':repeat_one: :map: __{}__'), value=map_value)
+        return embed
+
+    async def _process_vote(self, reaction, member):
+        """ Handler function for both match type and map vote reactions. """
+        # Check that the reaction isn't the bot's own
+        if self._is_own(member):
+            return
+
+        emoji = str(reaction)
+
+        try:
+            if emoji in self.numbers:
+                self.state.match_type.vote(member, self.numbers[emoji])
+            else:
+                self.state.maps.vote(member, self.emoji_maps.get(emoji))
+        except VoteError:
+            await self.remove_reaction(reaction, member)
+            return
+
+        self.render(self._vote_embed)
+        # Check if the voting is over
+        if self.state.done:
+            self._resolve()
+
+    async def vote(self, mpool):
+        """ Run both votes in a single round and return the number of maps and the maps picked. """
+        self.state = CombinedVote(mpool, self.members, self.captains, self.numbers.values())
+        self.emoji_maps = {m.emoji: m for m in mpool}
+        await self.edit(embed=self._vote_embed())
+        self.future = self.bot.loop.create_future()
+
+        with self.bot.reaction_router.route(self.id, self._process_vote):
+            self.seed_reactions(list(self.numbers) + [m.emoji for m in mpool])
+
+            try:
+                await asyncio.wait_for(self.future, 60)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                await self._settle()
+
         try:
             await self.clear_reactions()
         except discord.errors.NotFound:
             pass
 
-        # Gather results
-        winners_emoji = []
-        winners_votes = 0
-
-        for emoji, votes in self.num_votes.items():
-            if votes > winners_votes:
-                winners_emoji.clear()
-                winners_emoji.append(emoji)
-                winners_votes = votes
-            elif votes == winners_votes:
-                winners_emoji.append(emoji)
-
-        if len(winners_emoji) <= 2:
-            return self.numbers.index(winners_emoji[0]) + 1
-        else:  # Force set Bo1 if no captains voted
-            return 1
+        return self.state.result()
@@ -0,0 +1,95 @@
+# metrics.py
+
+import aiohttp
+from aiohttp import web
+from discord.ext import commands
+import logging
+
+from bot.helpers.metrics import endpoint_label
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RateLimitCounter(logging.Handler):
+    """ Counts the rate limits discord.py logs when it waits for a 429 to clear. """
+
+    def __init__(self, counter):
+        """ Set attributes, only the warnings reach the handler. """
+        super().__init__(logging.WARNING)
+        self.counter = counter
+
+    def emit(self, record):
+        """ Count the rate limit warnings by scope. """
+        if record.msg.startswith('We are being rate limited'):
+            self.counter.inc('route')
+        elif record.msg.startswith('Global rate limit'):
+            self.counter.inc('global')
+
+
+class MetricsCog(commands.Cog):
+    """ Serves the bot's metrics in the Prometheus text format and hooks the instruments up. """
+
+    def __init__(self, bot):
+        """ Set attributes and hook the helpers up, the metrics server is started by the bot setup. """
+        self.bot = bot
+        self.logger = logging.getLogger('csgoleague.metrics')
+        self.app = web.Application()
+        self.app.router.add_get('/metrics', self.metrics)
+        self.runner = None
+
+        # Time the API requests by endpoint
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.on_request_start)
+        trace_config.on_request_end.append(self.on_request_end)
+        trace_config.on_request_exception.append(self.on_request_exception)
+        self.bot.api_helper.trace_configs.append(trace_config)
+
+        # Time the database statements and pool wait
+        self.bot.db_helper.metrics = self.bot.metrics
+
+        # Count the rate limits and the menus
+        self.rate_limit_counter = RateLimitCounter(self.bot.metrics.rate_limits)
+        logging.getLogger('discord.http').addHandler(self.rate_limit_counter)
+        self.bot.metrics.gauge('csgoleague_active_menus', 'Menus waiting for reactions',
+                               lambda: len(self.bot.reaction_router.handlers))
+
+    async def start_server(self):
+        """ Listen for scrapes. """
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.bot.metrics_host, self.bot.metrics_port)
+
+        try:
+            await site.start()
+        except OSError as e:
+            self.logger.error(f'Unable to serve metrics on {self.bot.metrics_host}:{self.bot.metrics_port}: {e}')
+            await self.runner.cleanup()
+            self.runner = None
+            return
+
+        self.logger.info(f'Serving metrics on {self.bot.metrics_host}:{self.bot.metrics_port}/metrics')
+
+    def cog_unload(self):
+        """ Stop the metrics server and the rate limit counting. """
+        logging.getLogger('discord.http').removeHandler(self.rate_limit_counter)
+
+        if self.runner is not None:
+            self.bot.loop.create_task(self.runner.cleanup())
+
+    async def metrics(self, request):
+        """ Render the metrics, every instrument is in memory so this never waits. """
+        return web.Response(body=self.bot.metrics.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def on_request_start(self, session, ctx, params):
+        """ Start timing an API request. """
+        ctx.metrics_start = self.bot.loop.time()
+
+    async def on_request_end(self, session, ctx, params):
+        """ Observe the latency of an API request. """
+        self.bot.metrics.api_request.observe(self.bot.loop.time() - ctx.metrics_start, params.method,
+                                             endpoint_label(params.url.path), params.response.status)
+
+    async def on_request_exception(self, session, ctx, params):
+        """ Observe the latency of an API request that failed without a response. """
+        self.bot.metrics.api_request.observe(self.bot.loop.time() - ctx.metrics_start, params.method,
+                                             endpoint_label(params.url.path), 'error')
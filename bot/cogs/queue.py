@@ -5,6 +5,7 @@ from discord.errors import NotFound, HTTPException
 from discord.utils import get
 from collections import defaultdict
 import asyncio
+import time
 
 from bot.helpers.utils import translate
 
@@ -64,6 +65,28 @@ class QueueCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
+        """ Update the queues of the lobbies the member left or joined, timed when the metrics are enabled. """
+        if self.bot.metrics is None:
+            await self.update_queues(member, before, after)
+            return
+
+        start = time.perf_counter()
+        outcome = 'failed'
+
+        try:
+            burst_time = await self.update_queues(member, before, after)
+            outcome = 'updated' if burst_time is None else 'filled'
+        finally:
+            elapsed = time.perf_counter() - start
+
+            if outcome == 'filled':  # Match setup is timed apart so it doesn't swamp the handler latency
+                elapsed -= burst_time
+                self.bot.metrics.queue_burst.observe(burst_time)
+
+            self.bot.metrics.voice_state_update.observe(elapsed, outcome)
+
+    async def update_queues(self, member, before, after):
+        """ Add or remove the member from the queues, return the seconds the match setup took if a queue filled up. """
         if before.channel == after.channel:
             return
 
@@ -84,6 +107,8 @@ class QueueCog(commands.Cog):
             if self.block_lobby[after_lobby.category]:
                 return
 
+            await self.bot.use_locale(after_lobby.category)
+
             if not await self.bot.api_helper.is_linked(member.id):  # Message author isn't linked
                 title = translate('account-not-linked', member.display_name)
             else:  # Message author is linked
@@ -115,8 +140,12 @@ class QueueCog(commands.Cog):
                     queue_ids += [member.id]
                     title = translate('added-to-queue', member.display_name)
 
+                    if self.bot.metrics is not None:
+                        self.bot.metrics.queue_events.inc('join')
+
                     # Check and burst queue if full
                     if len(queue_ids) == capacity:
+                        burst_start = time.perf_counter()
                         self.block_lobby[after_lobby.category] = True
                         match_cog = self.bot.get_cog('MatchCog')
                         pug_role_id = await self.bot.get_pug_data(after_lobby.category, 'pug_role')
@@ -141,10 +170,11 @@ class QueueCog(commands.Cog):
 
                         self.block_lobby[after_lobby.category] = False
                         await after_lobby.set_permissions(pug_role, connect=True)
+                        burst_time = time.perf_counter() - burst_start
                         title = translate('players-in-queue')
                         embed = await self.queue_embed(after_lobby.category, title)
                         await self.update_last_msg(after_lobby.category, embed)
-                        return
+                        return burst_time
 
             embed = await self.queue_embed(after_lobby.category, title)
             # Delete last queue message
@@ -154,10 +184,15 @@ class QueueCog(commands.Cog):
             if self.block_lobby[before_lobby.category]:
                 return
 
+            await self.bot.use_locale(before_lobby.category)
+
             removed = await self.bot.db_helper.delete_queued_users(before_lobby.category_id, member.id)
 
             if member.id in removed:
                 title = translate('removed-from-queue', member.display_name)
+
+                if self.bot.metrics is not None:
+                    self.bot.metrics.queue_events.inc('leave')
             else:
                 title = translate('not-in-queue', member.display_name)
 
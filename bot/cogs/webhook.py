@@ -0,0 +1,81 @@
+# webhook.py
+
+from aiohttp import web
+from discord.ext import commands
+import hashlib
+import hmac
+import json
+import logging
+
+
+RECONCILE_INTERVAL = 60.0  # Seconds between matches_status polls while match ends are pushed
+
+
+class WebhookCog(commands.Cog):
+    """ Receives match end notifications pushed by the web API or the game server plugin. """
+
+    def __init__(self, bot):
+        """ Set attributes, the webhook server is started by the bot setup. """
+        self.bot = bot
+        self.logger = logging.getLogger('csgoleague.webhook')
+        self.secret = self.bot.webhook_secret.encode()
+        self.app = web.Application()
+        self.app.router.add_post('/match/end', self.match_end)
+        self.runner = None
+
+    async def start_server(self):
+        """ Listen for webhook requests and slow the match status poller down to reconciliation. """
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.bot.webhook_host, self.bot.webhook_port)
+
+        try:
+            await site.start()
+        except OSError as e:  # Keep polling the match statuses without the webhook
+            self.logger.error(f'Unable to listen for match webhooks on {self.bot.webhook_host}:'
+                              f'{self.bot.webhook_port}: {e}')
+            await self.runner.cleanup()
+            self.runner = None
+            return
+
+        self.logger.info(f'Listening for match webhooks on {self.bot.webhook_host}:{self.bot.webhook_port}')
+
+        match_cog = self.bot.get_cog('MatchCog')
+        match_cog.min_poll_interval = RECONCILE_INTERVAL
+        match_cog.update_matches.change_interval(seconds=match_cog.next_poll_interval())
+
+    def cog_unload(self):
+        """ Stop the webhook server. """
+        if self.runner is not None:
+            self.bot.loop.create_task(self.runner.cleanup())
+
+    def verify_signature(self, body, signature):
+        """ Check the request body against its HMAC-SHA256 signature. """
+        expected = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+
+        if signature.startswith('sha256='):
+            signature = signature[len('sha256='):]
+
+        return hmac.compare_digest(expected, signature)
+
+    async def match_end(self, request):
+        """ Tear down the match channels as soon as the match is over. """
+        body = await request.read()
+
+        if not self.verify_signature(body, request.headers.get('X-Signature', '')):
+            self.logger.warning(f'Rejected match webhook with invalid signature from {request.remote}')
+            return web.json_response({'success': False}, status=401)
+
+        try:
+            match_id = str(json.loads(body)['match_id'])
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({'success': False}, status=400)
+
+        match_cog = self.bot.get_cog('MatchCog')
+
+        if match_id not in match_cog.match_dict:
+            return web.json_response({'success': False}, status=404)
+
+        # Answer right away, the teardown takes several Discord requests
+        self.bot.loop.create_task(match_cog.end_matches(match_id))
+        return web.json_response({'success': True})
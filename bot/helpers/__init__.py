@@ -2,8 +2,25 @@
 
 from .api import ApiHelper
 from .db import DBHelper
+from .backlog import MatchBacklog, PendingMatch
+from .drafting import TeamDraft, MapVeto, MapVote, MatchTypeVote, CombinedVote
+from .steamids import SteamResolver
+from .metrics import Metrics
+from .tracing import Tracer
+from .watchdog import LoopWatchdog
 
 __all__ = [
     ApiHelper,
-    DBHelper
+    DBHelper,
+    MatchBacklog,
+    PendingMatch,
+    TeamDraft,
+    MapVeto,
+    MapVote,
+    MatchTypeVote,
+    CombinedVote,
+    SteamResolver,
+    Metrics,
+    Tracer,
+    LoopWatchdog
 ]
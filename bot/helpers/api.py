@@ -5,6 +5,10 @@ import asyncio
 import json
 import logging
 
+from .utils import sample_debug
+
+RESERVE_UNSUPPORTED_STATUSES = (404, 405)  # Web API without the reservation endpoint
+
 
 def catch_ZeroDivisionError(func):
     """ Decorator to catch ZeroDivisionError and return 0. """
@@ -187,6 +191,59 @@ class MatchServer:
         if self.web_url:
             return f'{self.web_url}/match/{self.id}'
 
+
+class ServerReservation:
+    """ A match server slot held through the API while the pre-match menus run. """
+
+    def __init__(self, api_helper):
+        """ Set attributes and start reserving the server slot in the background. """
+        self.api_helper = api_helper
+        self.id = None
+        self.task = api_helper.loop.create_task(self._reserve())
+
+    async def _reserve(self):
+        """ Ask the API to hold a server slot. """
+        try:
+            self.id = await self.api_helper.reserve_server()
+        except (aiohttp.ClientResponseError, ValueError, KeyError) as e:
+            unsupported = (not isinstance(e, aiohttp.ClientResponseError) or isinstance(e, aiohttp.ContentTypeError)
+                           or e.status in RESERVE_UNSUPPORTED_STATUSES)
+
+            if not unsupported:  # No server free, the pre-match phases stop early
+                raise
+
+            # Web API without reservation support, the server is allocated on commit instead
+            self.api_helper.logger.warning(f'Unable to reserve a server slot, starting the match without one: '
+                                           f'{type(e).__name__} {e}')
+
+    @property
+    def failed(self):
+        """ Whether the API refused to reserve a server slot. """
+        return self.task.done() and not self.task.cancelled() and self.task.exception() is not None
+
+    async def commit(self, team_one, team_two, spectators=None, map_pick=None):
+        """ Start the match on the reserved server slot. """
+        await self.task  # Raises the reservation error if no server could be reserved
+        match = await self.api_helper.start_match(team_one, team_two, spectators, map_pick, self.id)
+        self.id = None
+        return match
+
+    async def release(self):
+        """ Give the reserved server slot back to the API. """
+        try:
+            await self.task
+        except (asyncio.CancelledError, aiohttp.ClientError):
+            return
+
+        if self.id is not None:
+            reservation_id, self.id = self.id, None
+
+            try:
+                await self.api_helper.release_server(reservation_id)
+            except aiohttp.ClientError:
+                self.api_helper.logger.warning(f'Unable to release server reservation {reservation_id}')
+
+
 async def start_request_log(session, ctx, params):
     """"""
     ctx.start = asyncio.get_event_loop().time()
@@ -200,9 +257,11 @@ async def end_request_log(session, ctx, params):
     elapsed = asyncio.get_event_loop().time() - ctx.start
     logger.info(f'Response received from {params.url} ({elapsed:.2f}s)\n'
                 f'    Status: {params.response.status}\n'
-                f'    Reason: {params.response.reason}')
-    resp_json = await params.response.json()
-    logger.debug(f'Response JSON from {params.url}: {resp_json}')
+                f'    Reason: {params.response.reason}', extra={'latency_ms': round(elapsed * 1000)})
+
+    if logger.isEnabledFor(logging.DEBUG) and sample_debug():  # Only parse the body when it's logged
+        resp_json = await params.response.json()
+        logger.debug(f'Response JSON from {params.url}: {resp_json}', extra={'sampled': True})
 
 
 class ApiHelper:
@@ -210,14 +269,21 @@ class ApiHelper:
 
     def __init__(self, loop, base_url, api_key):
         """ Set attributes. """
+        self.loop = loop
         self.base_url = base_url
         self.api_key = api_key
         self.logger = logging.getLogger('csgoleague.api')
+        self.status_validators = {}  # Cache validators of the last conditional matches_status response
+
+        self.session = None
+        self.trace_configs = []  # Added before connecting to trace the requests of the session
 
         # Check API URL
         if not self.base_url.startswith('https') and self.base_url.startswith('http'):
             self.logger.warning(f'API url "{self.base_url}" should start with "https" instead of "http"')
 
+    async def connect(self):
+        """ Start the client session from the running loop. """
         # Register trace config handlers
         trace_config = aiohttp.TraceConfig()
         trace_config.on_request_start.append(start_request_log)
@@ -225,13 +291,14 @@ class ApiHelper:
 
         # Start session
         self.logger.info('Starting API helper client session')
-        self.session = aiohttp.ClientSession(loop=loop, json_serialize=lambda x: json.dumps(x, ensure_ascii=False),
-                                             raise_for_status=True)
+        self.session = aiohttp.ClientSession(loop=self.loop, json_serialize=lambda x: json.dumps(x, ensure_ascii=False),
+                                             raise_for_status=True, trace_configs=self.trace_configs)
 
     async def close(self):
         """ Close the API helper's session. """
-        self.logger.info('Closing API helper client session')
-        await self.session.close()
+        if self.session is not None:
+            self.logger.info('Closing API helper client session')
+            await self.session.close()
 
     @property
     def headers(self):
@@ -305,7 +372,8 @@ class ApiHelper:
 
         async with self.session.post(url=url, headers=self.headers, json=discord_ids) as resp:
             players = await resp.json()
-            players.sort(key=lambda x: member_ids.index(int(x['discord'])))
+            order = {member_id: index for index, member_id in enumerate(member_ids)}
+            players.sort(key=lambda x: order[int(x['discord'])])
             return [Player(player_data, self.base_url) for player_data in players]
 
     async def end_match(self, match_id):
@@ -316,11 +384,29 @@ class ApiHelper:
             resp_json = await resp.json()
             return resp_json['success']
 
-    async def matches_status(self):
-        """ Get matches status through the API. """
+    async def matches_status(self, conditional=False):
+        """ Get matches status through the API.
+
+        A conditional request returns None when nothing changed since the last conditional request.
+        """
         url = f'{self.base_url}/match/status'
+        headers = self.headers
+
+        if conditional:
+            headers.update(self.status_validators)
+
+        async with self.session.get(url=url, headers=headers) as resp:
+            if resp.status == 304:
+                return None
+
+            if conditional:
+                self.status_validators.clear()
+
+                if 'ETag' in resp.headers:
+                    self.status_validators['If-None-Match'] = resp.headers['ETag']
+                if 'Last-Modified' in resp.headers:
+                    self.status_validators['If-Modified-Since'] = resp.headers['Last-Modified']
 
-        async with self.session.get(url=url, headers=self.headers) as resp:
             return await resp.json()
 
     async def send_server_message(self, matchid, msg):
@@ -331,7 +417,26 @@ class ApiHelper:
         async with self.session.post(url=url, headers=self.headers, data=data) as resp:
             return resp.status == 200
 
-    async def start_match(self, team_one, team_two, spectators=None, map_pick=None):
+    async def reserve_server(self):
+        """ Hold a match server slot through the API and return the reservation ID. """
+        url = f'{self.base_url}/match/reserve'
+
+        async with self.session.post(url=url, headers=self.headers) as resp:
+            resp_json = await resp.json()
+            return resp_json['reservation_id']
+
+    async def release_server(self, reservation_id):
+        """ Release a server slot held by reserve_server. """
+        url = f'{self.base_url}/match/release/{reservation_id}'
+
+        async with self.session.post(url=url, headers=self.headers) as resp:
+            return resp.status == 200
+
+    def reserve_server_slot(self):
+        """ Start reserving a server slot in the background while the match is being set up. """
+        return ServerReservation(self)
+
+    async def start_match(self, team_one, team_two, spectators=None, map_pick=None, reservation_id=None):
         """ Get a match server from the API. """
         url = f'{self.base_url}/match/start'
         data = {
@@ -345,5 +450,8 @@ class ApiHelper:
         if map_pick:
             data['maps'] = map_pick
 
+        if reservation_id is not None:
+            data['reservation_id'] = reservation_id
+
         async with self.session.post(url=url, headers=self.headers, json=data) as resp:
             return MatchServer(await resp.json(), self.base_url)
@@ -0,0 +1,65 @@
+# assets.py
+
+import hashlib
+import os
+
+ICONS_DIR = 'assets/maps/icons/'
+ICONS_URL = 'https://raw.githubusercontent.com/thboss/CSGO-PUGs-Bot/master/assets/maps/icons/'
+MAX_ICON_SIZE = 256000  # Discord's emoji size limit
+
+_manifest = None
+
+
+class MapIcon:
+    """ A map icon file in the assets and the hash of its content. """
+
+    def __init__(self, name, dev_name, filename, content_hash):
+        """ Set attributes. """
+        self.name = name
+        self.dev_name = dev_name
+        self.filename = filename
+        self.content_hash = content_hash
+
+    @property
+    def path(self):
+        """ Path of the icon file. """
+        return os.path.join(ICONS_DIR, self.filename)
+
+    @property
+    def url(self):
+        """ URL of the icon in the upstream repository. """
+        return ICONS_URL + self.filename.replace(' ', '%20')
+
+    def read(self):
+        """ Content of the icon file. """
+        with open(self.path, 'rb') as image:
+            return image.read()
+
+
+def _build_manifest():
+    """ List, check and hash every usable map icon named "<name>-<dev_name>.png". """
+    icons = []
+
+    for entry in sorted(os.scandir(ICONS_DIR), key=lambda e: e.name):
+        if not entry.name.endswith('.png') or '-' not in entry.name or entry.stat().st_size >= MAX_ICON_SIZE:
+            continue
+
+        name = entry.name.split('-')[0]
+        dev_name = entry.name.split('-')[1].split('.')[0]
+
+        with open(entry.path, 'rb') as image:
+            content_hash = hashlib.sha1(image.read()).hexdigest()
+
+        icons.append(MapIcon(name, dev_name, entry.name, content_hash))
+
+    return icons
+
+
+def map_icons():
+    """ Manifest of the map icons, built the first time it's needed. """
+    global _manifest
+
+    if _manifest is None:
+        _manifest = _build_manifest()
+
+    return _manifest
@@ -0,0 +1,138 @@
+# backlog.py
+
+import aiohttp
+import asyncio
+from collections import defaultdict, deque
+import contextvars
+import logging
+
+
+class PendingMatch:
+    """ A drafted match waiting for a server. """
+
+    def __init__(self, category, message, team_one, team_two, spect_members, spect_steams, map_pick):
+        """ Set attributes. """
+        self.category = category
+        self.message = message
+        self.team_one = team_one
+        self.team_two = team_two
+        self.spect_members = spect_members
+        self.spect_steams = spect_steams
+        self.map_pick = map_pick
+        self.attempts = 0
+        self.queued_at = None
+        self.next_attempt = None
+
+    @property
+    def members(self):
+        """ All the players of the match. """
+        return self.team_one + self.team_two
+
+
+class MatchBacklog:
+    """ Per-guild FIFO of drafted matches that retries server allocation with backoff. """
+
+    def __init__(self, loop, dispatch, expire, max_size=5, max_wait=900, base_delay=5, max_delay=60):
+        """ Set attributes. """
+        self.loop = loop
+        self.dispatch = dispatch  # Coroutine that starts a pending match, raises ClientResponseError without servers
+        self.expire = expire  # Coroutine cleaning up after pending matches that waited too long or failed to start
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queues = defaultdict(deque)
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.logger = logging.getLogger('csgoleague.backlog')
+
+    def has_room(self, guild):
+        """ Check if another match of the guild can wait in the backlog. """
+        return len(self.queues.get(guild, ())) < self.max_size
+
+    def push(self, guild, pending):
+        """ Add a pending match to the end of the guild's backlog and return its position. """
+        now = self.loop.time()
+        pending.queued_at = now
+        pending.next_attempt = now + self.base_delay
+        self.queues[guild].append(pending)
+        self.logger.info(f'Match of category {pending.category.id} backlogged '
+                         f'(position {len(self.queues[guild])} in guild {guild.id})')
+
+        if self.task is None or self.task.done():
+            self.task = self._isolated(self._run())
+
+        return len(self.queues[guild])
+
+    def kick(self):
+        """ Retry the head of every backlog right away, called when servers free up. """
+        for queue in self.queues.values():
+            if queue:
+                queue[0].next_attempt = self.loop.time()
+
+        self.wakeup.set()
+
+    def _isolated(self, coro):
+        """ Run a coroutine in a task with fresh context variables, no locale, log context or trace is shared. """
+        return contextvars.Context().run(self.loop.create_task, coro)
+
+    async def _expire(self, pending):
+        """ Clean up after a pending match that won't be started. """
+        try:
+            await self._isolated(self.expire(pending))
+        except Exception:
+            self.logger.exception(f'Unable to clean up backlogged match of category {pending.category.id}')
+
+    def _backoff(self, attempts):
+        """ Exponential delay before the next allocation attempt. """
+        return min(self.max_delay, self.base_delay * 2 ** attempts)
+
+    async def _drain(self, guild, queue):
+        """ Dispatch the due matches at the head of a guild's backlog in FIFO order. """
+        while queue:
+            pending = queue[0]
+            now = self.loop.time()
+
+            if now - pending.queued_at > self.max_wait:
+                queue.popleft()
+                await self._expire(pending)
+                continue
+
+            if pending.next_attempt > now:
+                return
+
+            try:
+                await self._isolated(self.dispatch(pending))
+            except aiohttp.ClientResponseError:
+                # Still no servers, later matches would not get one either
+                pending.attempts += 1
+                pending.next_attempt = now + self._backoff(pending.attempts)
+                return
+            except Exception:
+                self.logger.exception(f'Unable to dispatch backlogged match of category {pending.category.id}')
+                queue.popleft()
+                await self._expire(pending)
+                continue
+
+            queue.popleft()
+
+    async def _run(self):
+        """ Keep dispatching backlogged matches until every backlog is empty. """
+        while any(self.queues.values()):
+            for guild, queue in list(self.queues.items()):
+                await self._drain(guild, queue)
+
+                if not queue:
+                    self.queues.pop(guild, None)
+
+            if not self.queues:
+                break
+
+            heads = [queue[0] for queue in self.queues.values()]
+            delay = min(min(p.next_attempt, p.queued_at + self.max_wait) for p in heads) - self.loop.time()
+            self.wakeup.clear()
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
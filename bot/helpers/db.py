@@ -1,30 +1,133 @@
 # db.py
 
 
-import asyncio
 import asyncpg
-import os
+from collections import deque
 import logging
+import time
 
-icons_dir = 'assets/maps/icons/'
-maps = [_map for _map in os.listdir(icons_dir) if
-        _map.endswith('.png') and '-' in _map and os.stat(icons_dir + _map).st_size < 256000]
+from .assets import map_icons
+from .tracing import record_span
+
+
+SLOW_STATEMENT_MS = 100  # Statements slower than this are logged with their parameters redacted
+STATEMENT_SAMPLES = 1000  # Recent durations kept for the percentiles of each statement
+
+
+def _percentile(sorted_values, share):
+    """ Value under which a share of the sorted values are. """
+    return sorted_values[min(int(len(sorted_values) * share), len(sorted_values) - 1)]
+
+
+def _redact(value):
+    """ Type and size of a statement parameter without its value. """
+    if isinstance(value, (list, tuple)):
+        return f'<{type(value).__name__} of {len(value)}>'
+
+    return f'<{type(value).__name__}>'
+
+
+def _row_count(result):
+    """ Number of rows a statement returned or affected. """
+    if isinstance(result, list):
+        return len(result)
+
+    if isinstance(result, str):  # Status of an executed statement, E.g. "INSERT 0 5"
+        count = result.rsplit(' ', 1)[-1]
+        return int(count) if count.isdigit() else 0
+
+    return 0 if result is None else 1
+
+
+class StatementStats:
+    """ Calls, rows and recent durations of a named statement. """
+
+    __slots__ = ('calls', 'rows', 'total', 'durations', 'waits')
+
+    def __init__(self):
+        """ Set attributes. """
+        self.calls = 0
+        self.rows = 0
+        self.total = 0.0  # Seconds spent executing the statement since the start
+        self.durations = deque(maxlen=STATEMENT_SAMPLES)
+        self.waits = deque(maxlen=STATEMENT_SAMPLES)
+
+    def add(self, rows, wait, duration):
+        """ Record a call of the statement. """
+        self.calls += 1
+        self.rows += rows
+        self.total += duration
+        self.durations.append(duration)
+        self.waits.append(wait)
+
+    def percentiles(self, *shares):
+        """ Percentiles of the recent durations then of the recent pool waits. """
+        durations = sorted(self.durations)
+        waits = sorted(self.waits)
+        return [_percentile(durations, share) for share in shares] + [_percentile(waits, share) for share in shares]
 
 
 class DBHelper:
     """ Class to contain database query wrapper functions. """
 
-    def __init__(self, connect_url):
+    def __init__(self, connect_url, slow_statement_ms=SLOW_STATEMENT_MS):
         """ Set attributes. """
-        loop = asyncio.get_event_loop()
+        self.connect_url = connect_url
+        self.slow_statement_ms = slow_statement_ms
         self.logger = logging.getLogger('csgoleague.db')
+        self.pool = None
+        self.metrics = None  # Set to observe the statements in the metrics
+        self.statement_stats = {}  # Statement name: StatementStats
+
+    async def connect(self):
+        """ Create the connection pool. """
         self.logger.info('Creating database connection pool')
-        self.pool = loop.run_until_complete(asyncpg.create_pool(connect_url))
+        self.pool = await asyncpg.create_pool(self.connect_url)
 
     async def close(self):
         """"""
-        self.logger.info('Closing database connection pool')
-        await self.pool.close()
+        if self.pool is not None:
+            self.logger.info('Closing database connection pool')
+            await self.pool.close()
+
+    async def _query(self, name, method, statement, *args, transaction=False):
+        """ Run a statement with a connection method and record its pool wait, duration and rows under a name. """
+        start = time.perf_counter()
+
+        async with self.pool.acquire() as connection:
+            acquired = time.perf_counter()
+
+            if transaction:
+                async with connection.transaction():
+                    result = await getattr(connection, method)(statement, *args)
+            else:  # A single statement is atomic on its own
+                result = await getattr(connection, method)(statement, *args)
+
+            end = time.perf_counter()
+
+        wait = acquired - start
+        duration = end - acquired
+        rows = len(args[0]) if method == 'executemany' else _row_count(result)
+
+        try:
+            stats = self.statement_stats[name]
+        except KeyError:
+            stats = self.statement_stats[name] = StatementStats()
+
+        stats.add(rows, wait, duration)
+        record_span(name, 'db', start, end, rows=rows, wait_ms=round(wait * 1000, 1))
+
+        if self.metrics is not None:
+            self.metrics.db_query.observe(duration, name)
+            self.metrics.db_pool_wait.observe(wait)
+
+        if duration * 1000 >= self.slow_statement_ms:
+            params = ', '.join(f'${num}={_redact(arg)}' for num, arg in enumerate(args, start=1))
+            self.logger.warning(f'Slow statement {name} took {duration * 1000:.0f} ms after waiting '
+                                f'{wait * 1000:.0f} ms for a connection, {rows} rows ({params}): '
+                                f'{" ".join(statement.split())}')
+
+        return result
 
     @staticmethod
     def _get_record_attrs(records, key):
@@ -38,9 +141,8 @@ class DBHelper:
             '    WHERE id = $1'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                row = await connection.fetchrow(statement, row_id)
+        row = await self._query(f'_get_row({table})', 'fetchrow', statement, row_id)
+
         try:
             return {col: val for col, val in row.items()}
         except AttributeError:
@@ -58,15 +160,14 @@ class DBHelper:
             f'    RETURNING {ret_vals};'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                updated_vals = await connection.fetch(statement, row_id, *[data[col] for col in cols])
+        updated_vals = await self._query(f'_update_row({table})', 'fetch', statement, row_id,
+                                         *[data[col] for col in cols])
 
         return {col: val for rec in updated_vals for col, val in rec.items()}
 
     async def insert_pugs(self, *pug_ids):
         """ Add a list of pugs into the pugs table and return the ones successfully added. """
-        rows = [tuple([pug_id] + [None] * 9 + [None] * len(maps)) for pug_id in pug_ids]
+        rows = [tuple([pug_id] + [None] * 9 + [None] * len(map_icons()) + [None] * 3) for pug_id in pug_ids]
         statement = (
             'INSERT INTO pugs (id)\n'
             '    (SELECT id FROM unnest($1::pugs[]))\n'
@@ -74,9 +175,7 @@ class DBHelper:
             '    RETURNING id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                inserted = await connection.fetch(statement, rows)
+        inserted = await self._query('insert_pugs', 'fetch', statement, rows)
 
         return self._get_record_attrs(inserted, 'id')
 
@@ -88,9 +187,7 @@ class DBHelper:
             '    RETURNING id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, pug_ids)
+        deleted = await self._query('delete_pugs', 'fetch', statement, pug_ids)
 
         return self._get_record_attrs(deleted, 'id')
 
@@ -104,9 +201,7 @@ class DBHelper:
             '    RETURNING id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                inserted = await connection.fetch(statement, rows)
+        inserted = await self._query('insert_users', 'fetch', statement, rows)
 
         return self._get_record_attrs(inserted, 'id')
 
@@ -118,9 +213,7 @@ class DBHelper:
             '    RETURNING id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, user_ids)
+        deleted = await self._query('delete_users', 'fetch', statement, user_ids)
 
         return self._get_record_attrs(deleted, 'id')
 
@@ -131,9 +224,7 @@ class DBHelper:
             '    WHERE guild_id = $1;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                queue = await connection.fetch(statement, guild_id)
+        queue = await self._query('get_queued_users', 'fetch', statement, guild_id)
 
         return self._get_record_attrs(queue, 'user_id')
 
@@ -144,9 +235,7 @@ class DBHelper:
             '    (SELECT * FROM unnest($1::queued_users[]));'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                await connection.execute(statement, [(guild_id, user_id) for user_id in user_ids])
+        await self._query('insert_queued_users', 'execute', statement, [(guild_id, user_id) for user_id in user_ids])
 
     async def delete_queued_users(self, guild_id, *user_ids):
         """ Delete multiple users of a guild from the queued_users table. """
@@ -156,9 +245,7 @@ class DBHelper:
             '    RETURNING user_id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, guild_id, user_ids)
+        deleted = await self._query('delete_queued_users', 'fetch', statement, guild_id, user_ids)
 
         return self._get_record_attrs(deleted, 'user_id')
 
@@ -170,9 +257,7 @@ class DBHelper:
             '    RETURNING user_id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, guild_id)
+        deleted = await self._query('delete_all_queued_users', 'fetch', statement, guild_id)
 
         return self._get_record_attrs(deleted, 'user_id')
 
@@ -183,9 +268,7 @@ class DBHelper:
             '    WHERE guild_id = $1;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                queue = await connection.fetch(statement, guild_id)
+        queue = await self._query('get_spect_users', 'fetch', statement, guild_id)
 
         return self._get_record_attrs(queue, 'user_id')
 
@@ -196,9 +279,7 @@ class DBHelper:
             '    (SELECT * FROM unnest($1::spect_users[]));'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                await connection.execute(statement, [(guild_id, user_id) for user_id in user_ids])
+        await self._query('insert_spect_users', 'execute', statement, [(guild_id, user_id) for user_id in user_ids])
 
     async def delete_spect_users(self, guild_id, *user_ids):
         """ Delete multiple users of a guild from the spect_users table. """
@@ -208,9 +289,7 @@ class DBHelper:
             '    RETURNING user_id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, guild_id, user_ids)
+        deleted = await self._query('delete_spect_users', 'fetch', statement, guild_id, user_ids)
 
         return self._get_record_attrs(deleted, 'user_id')
 
@@ -222,12 +301,175 @@ class DBHelper:
             '    RETURNING user_id;'
         )
 
-        async with self.pool.acquire() as connection:
-            async with connection.transaction():
-                deleted = await connection.fetch(statement, guild_id)
+        deleted = await self._query('delete_all_spect_users', 'fetch', statement, guild_id)
+
+        return self._get_record_attrs(deleted, 'user_id')
+
+    async def insert_match(self, message_id, pug_id, channel_id):
+        """ Register a match being set up from its ready message in the matches table. """
+        statement = (
+            'INSERT INTO matches (id, pug_id, channel_id)\n'
+            '    VALUES ($1, $2, $3)\n'
+            '    ON CONFLICT (id) DO NOTHING;'
+        )
+
+        await self._query('insert_match', 'execute', statement, message_id, pug_id, channel_id)
+
+    async def get_matches(self):
+        """ Get all the registered matches from the matches table. """
+        statement = 'SELECT * FROM matches;'
+
+        rows = await self._query('get_matches', 'fetch', statement)
+
+        return [{col: val for col, val in row.items()} for row in rows]
+
+    async def update_match(self, message_id, **data):
+        """ Update a match's row in the matches table. """
+        return await self._update_row('matches', message_id, **data)
+
+    async def delete_matches(self, *message_ids):
+        """ Delete multiple matches from the matches table. """
+        statement = (
+            'DELETE FROM matches\n'
+            '    WHERE id = ANY($1::BIGINT[])\n'
+            '    RETURNING id;'
+        )
+
+        deleted = await self._query('delete_matches', 'fetch', statement, message_ids)
+
+        return self._get_record_attrs(deleted, 'id')
+
+    async def get_ban_rates(self, pug_id):
+        """ Get the share of a pug's map vetoes each map was banned in. """
+        statement = (
+            'SELECT map, banned::REAL / offered AS rate FROM map_bans\n'
+            '    WHERE pug_id = $1 AND offered > 0;'
+        )
+
+        rows = await self._query('get_ban_rates', 'fetch', statement, pug_id)
+
+        return {row['map']: row['rate'] for row in rows}
+
+    async def insert_map_bans(self, pug_id, offered_maps, banned_maps):
+        """ Add the maps offered and banned in a map veto to the pug's ban history. """
+        statement = (
+            'INSERT INTO map_bans (pug_id, map, offered, banned)\n'
+            '    (SELECT $1, map, 1, (map = ANY($3::TEXT[]))::INTEGER FROM unnest($2::TEXT[]) AS map)\n'
+            '    ON CONFLICT (pug_id, map) DO UPDATE\n'
+            '    SET offered = map_bans.offered + 1, banned = map_bans.banned + EXCLUDED.banned;'
+        )
+
+        await self._query('insert_map_bans', 'execute', statement, pug_id, offered_maps, banned_maps)
+
+    async def get_map_emojis(self):
+        """ Get the uploaded map emojis by map dev name. """
+        statement = 'SELECT * FROM map_emojis;'
+
+        rows = await self._query('get_map_emojis', 'fetch', statement)
+
+        return {row['dev_name']: {col: val for col, val in row.items()} for row in rows}
+
+    async def upsert_map_emojis(self, guild_id, *emojis):
+        """ Store the emojis uploaded for map icons as (dev name, emoji ID, content hash) tuples. """
+        rows = [(dev_name, guild_id, emoji_id, content_hash) for dev_name, emoji_id, content_hash in emojis]
+        statement = (
+            'INSERT INTO map_emojis (dev_name, guild_id, emoji_id, content_hash)\n'
+            '    VALUES ($1, $2, $3, $4)\n'
+            '    ON CONFLICT (dev_name) DO UPDATE\n'
+            '    SET guild_id = EXCLUDED.guild_id, emoji_id = EXCLUDED.emoji_id, content_hash = EXCLUDED.content_hash;'
+        )
+
+        await self._query('upsert_map_emojis', 'executemany', statement, rows, transaction=True)
+
+    async def update_leaderboard(self, guild_id, *players):
+        """ Store the latest stat counters of players in a guild's leaderboard. """
+        rows = [(guild_id, p.discord, p.discord_name or '', p.score, p.kills, p.deaths, p.headshots, p.damage,
+                 p.rounds_tr + p.rounds_ct, p.match_win, p.match_lose, p.match_draw) for p in players]
+        statement = (
+            'INSERT INTO leaderboard (guild_id, user_id, name, score, kills, deaths, headshots, damage, rounds, wins, '
+            'losses, draws)\n'
+            '    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)\n'
+            '    ON CONFLICT (guild_id, user_id) DO UPDATE\n'
+            '    SET name = EXCLUDED.name, score = EXCLUDED.score, kills = EXCLUDED.kills, deaths = EXCLUDED.deaths,\n'
+            '        headshots = EXCLUDED.headshots, damage = EXCLUDED.damage, rounds = EXCLUDED.rounds,\n'
+            '        wins = EXCLUDED.wins, losses = EXCLUDED.losses, draws = EXCLUDED.draws;'
+        )
+
+        await self._query('update_leaderboard', 'executemany', statement, rows, transaction=True)
+
+    async def delete_leaders(self, guild_id, *user_ids):
+        """ Remove players from a guild's leaderboard. """
+        statement = (
+            'DELETE FROM leaderboard\n'
+            '    WHERE guild_id = $1 AND user_id = ANY($2::BIGINT[])\n'
+            '    RETURNING user_id;'
+        )
+
+        deleted = await self._query('delete_leaders', 'fetch', statement, guild_id, user_ids)
+
+        return self._get_record_attrs(deleted, 'user_id')
+
+    async def prune_leaderboard(self, guild_id, member_ids):
+        """ Remove the players who are no longer members of the guild from its leaderboard. """
+        statement = (
+            'DELETE FROM leaderboard\n'
+            '    WHERE guild_id = $1 AND NOT user_id = ANY($2::BIGINT[])\n'
+            '    RETURNING user_id;'
+        )
+
+        deleted = await self._query('prune_leaderboard', 'fetch', statement, guild_id, member_ids)
 
         return self._get_record_attrs(deleted, 'user_id')
 
+    async def delete_leaderboard(self, guild_id):
+        """ Remove a guild's whole leaderboard. """
+        await self._query('delete_leaderboard', 'execute', 'DELETE FROM leaderboard WHERE guild_id = $1;', guild_id)
+        await self._query('delete_leaderboard_guild', 'execute', 'DELETE FROM leaderboard_guilds WHERE guild_id = $1;',
+                          guild_id)
+
+    async def is_leaderboard_built(self, guild_id):
+        """ Check if a guild's leaderboard was built from all its members. """
+        statement = 'SELECT EXISTS(SELECT 1 FROM leaderboard_guilds WHERE guild_id = $1);'
+
+        return await self._query('is_leaderboard_built', 'fetchval', statement, guild_id)
+
+    async def insert_leaderboard_guild(self, guild_id):
+        """ Record that a guild's leaderboard was built from all its members. """
+        statement = (
+            'INSERT INTO leaderboard_guilds (guild_id)\n'
+            '    VALUES ($1)\n'
+            '    ON CONFLICT (guild_id) DO NOTHING;'
+        )
+
+        await self._query('insert_leaderboard_guild', 'execute', statement, guild_id)
+
+    async def get_leaders(self, guild_id, limit, offset=0):
+        """ Get a page of a guild's leaderboard ranked by score then matches played. """
+        statement = (
+            'SELECT *, wins + losses + draws AS matches FROM leaderboard\n'
+            '    WHERE guild_id = $1\n'
+            '    ORDER BY score DESC, wins + losses + draws DESC\n'
+            '    LIMIT $2 OFFSET $3;'
+        )
+
+        rows = await self._query('get_leaders', 'fetch', statement, guild_id, limit, offset)
+
+        return [{col: val for col, val in row.items()} for row in rows]
+
+    async def get_leaderboard(self, guild_id):
+        """ Get every row of a guild's leaderboard. """
+        statement = 'SELECT * FROM leaderboard WHERE guild_id = $1;'
+
+        rows = await self._query('get_leaderboard', 'fetch', statement, guild_id)
+
+        return [{col: val for col, val in row.items()} for row in rows]
+
+    async def count_leaders(self, guild_id):
+        """ Get the number of players in a guild's leaderboard. """
+        statement = 'SELECT COUNT(*) FROM leaderboard WHERE guild_id = $1;'
+
+        return await self._query('count_leaders', 'fetchval', statement, guild_id)
+
     async def get_pug(self, pug_id):
         """ Get a pug's row from the pugs table. """
         return await self._get_row('pugs', pug_id)
@@ -0,0 +1,313 @@
+# drafting.py
+
+import random
+
+
+class DraftError(ValueError):
+    """ Raised when an action isn't allowed in the current state of a draft, veto or vote. """
+
+    def __init__(self, reason):
+        """ Set the translation key of the reason. """
+        super().__init__(reason)
+        self.reason = reason
+
+
+class PickError(DraftError):
+    """ Raised when a team draft pick is invalid for some reason. """
+
+
+class BanError(DraftError):
+    """ Raised when a map ban is invalid for some reason. """
+
+
+class VoteError(DraftError):
+    """ Raised when a vote is invalid for some reason. """
+
+
+def pick_schedule(num_players):
+    """ Index of the team picking at each turn of a draft, one pick then two picks each in turns. """
+    return ((0,) + (1, 1, 0, 0) * (num_players // 4 + 1))[:max(num_players, 1)]
+
+
+def ban_schedule(num_pool, num_maps):
+    """ Index of the captain banning at each turn of a veto, the second captain starts on even pools. """
+    num_bans = max(num_pool - num_maps, 0)
+    first = 1 if num_pool % 2 == 0 else 0
+    return tuple((first + turn) % 2 for turn in range(num_bans))
+
+
+class TeamDraft:
+    """ State of a team draft where two captains pick players in turns. """
+
+    def __init__(self, players, schedule=None):
+        """ Set attributes. """
+        self.players = list(players)
+        self.index = {player: num for num, player in enumerate(self.players)}
+        self.left = dict.fromkeys(self.players)  # Insertion ordered set of the players left to pick
+        self.teams = ([], [])
+        self.team_of = {}
+        self.picked = []  # Players in the order they left the pool
+        self.schedule = schedule or pick_schedule(len(self.players))
+        self.pick_number = 0
+        self.team_size = len(self.players) // 2
+
+    @property
+    def captains(self):
+        """ Captains of both teams, None for a team without captain yet. """
+        return tuple(team[0] if team else None for team in self.teams)
+
+    @property
+    def active_team(self):
+        """ Index of the team picking this turn. """
+        return self.schedule[self.pick_number]
+
+    @property
+    def active_captain(self):
+        """ Get the active picker using the pick schedule and number. """
+        picking_team = self.teams[self.active_team]
+        return picking_team[0] if picking_team else None
+
+    @property
+    def done(self):
+        """ Whether every player has been picked. """
+        return not self.left
+
+    def _add(self, team, player):
+        """ Move a player from the players left to a team. """
+        del self.left[player]
+        self.teams[team].append(player)
+        self.team_of[player] = team
+        self.picked.append(player)
+
+    def set_captains(self, captain_1, captain_2):
+        """ Make the players captains of their respective team. """
+        self._add(0, captain_1)
+        self._add(1, captain_2)
+
+    def pick(self, picker, pickee):
+        """ Process a team captain's player pick and return the index of the picking team. """
+        if picker not in self.index:
+            raise PickError('picker-not-member')
+        if pickee not in self.left:
+            raise PickError('player-not-available')
+
+        team_one, team_two = self.teams
+
+        # Get picking team, the first pickers become the captains when captains volunteer
+        if picker == pickee:
+            raise PickError('picker-pick-self')
+        elif not team_one:
+            team = 0
+            self._add(team, picker)
+        elif not team_two and picker == team_one[0]:
+            raise PickError('picker-not-turn')
+        elif not team_two and self.team_of.get(picker) == 0:
+            raise PickError('picker-not-captain')
+        elif not team_two:
+            team = 1
+            self._add(team, picker)
+        elif picker == team_one[0]:
+            team = 0
+        elif picker == team_two[0]:
+            team = 1
+        else:
+            raise PickError('picker-not-captain')
+
+        # Check if it's picker's turn
+        if picker != self.active_captain:
+            raise PickError('picker-not-turn')
+
+        # Prevent picks when team is full
+        if len(self.teams[team]) > self.team_size:
+            raise PickError('team-full')
+
+        return self._take(team, pickee)
+
+    def auto_pick(self, score):
+        """ Play the active team's turn with the best players left, the first one captains a team without captain. """
+        team = self.active_team
+
+        if not self.teams[team]:
+            self._add(team, max(self.left, key=score))
+
+        captain = self.teams[team][0]
+        pickee = max(self.left, key=score)
+        self._take(team, pickee)
+        return captain, pickee
+
+    def _take(self, team, pickee):
+        """ Add the pick to the team, end the turn and return the index of the team the pick went to. """
+        team_one, team_two = self.teams
+
+        # A two player draft leaves the pick for the other team
+        if len(self.left) == 1 and len(self.teams[team]) > len(self.teams[1 - team]):
+            team = 1 - team
+
+        self._add(team, pickee)
+        self.pick_number += 1
+
+        # Last player left goes to the smallest team
+        if len(self.left) == 1:
+            self._add(0 if len(team_one) <= len(team_two) else 1, next(iter(self.left)))
+
+        return team
+
+
+class MapVeto:
+    """ State of a map veto where two captains ban maps in turns. """
+
+    def __init__(self, maps, captains, num_maps, schedule=None):
+        """ Set attributes. """
+        self.pool = list(maps)
+        self.maps_left = dict.fromkeys(self.pool)  # Insertion ordered set of the maps left
+        self.captains = list(captains)
+        self.num_maps = num_maps
+        self.schedule = schedule or ban_schedule(len(self.pool), num_maps)
+        self.ban_number = 0
+        self.auto_bans = []
+
+    @property
+    def active_captain(self):
+        """ Get the active banner using the ban schedule and number. """
+        return self.captains[self.schedule[self.ban_number]]
+
+    @property
+    def done(self):
+        """ Whether enough maps have been banned. """
+        return len(self.maps_left) <= self.num_maps
+
+    def ban(self, captain, map_ban):
+        """ Process a captain's map ban. """
+        if captain not in self.captains:
+            raise BanError('picker-not-captain')
+        if captain != self.active_captain:
+            raise BanError('picker-not-turn')
+        if map_ban not in self.maps_left:
+            raise BanError('map-not-available')
+
+        del self.maps_left[map_ban]
+        self.ban_number += 1
+
+    def auto_ban(self, ban_rate, rng=random):
+        """ Play the active captain's turn by banning the map left that gets banned the most. """
+        captain = self.active_captain
+        map_ban = max(self.maps_left, key=lambda m: (ban_rate(m), rng.random()))
+        self.ban(captain, map_ban)
+        self.auto_bans.append(map_ban)
+        return captain, map_ban
+
+    def result(self):
+        """ Maps left after the veto. """
+        return list(self.maps_left)
+
+
+class MapVote:
+    """ State of a map vote that runs off ties in additional rounds. """
+
+    def __init__(self, maps, voters):
+        """ Set attributes and start the first round. """
+        self.pool = list(maps)
+        self.voters = set(voters)
+        self.tie_count = 0
+        self.votes = None
+        self.ballots = None
+        self.top = 0
+        self.new_round()
+
+    def new_round(self):
+        """ Clear the votes for a new round. """
+        self.votes = dict.fromkeys(self.pool, 0)
+        self.ballots = {}
+        self.top = 0
+
+    @property
+    def done(self):
+        """ Whether everybody voted this round. """
+        return len(self.ballots) == len(self.voters)
+
+    def vote(self, voter, map_vote):
+        """ Process a voter's vote for a map. """
+        if voter not in self.voters:
+            raise VoteError('picker-not-member')
+        if voter in self.ballots:
+            raise VoteError('already-voted')
+        if map_vote not in self.votes:
+            raise VoteError('map-not-available')
+
+        self.ballots[voter] = map_vote
+        self.votes[map_vote] += 1
+        self.top = max(self.top, self.votes[map_vote])
+
+    def close_round(self, rng=random):
+        """ Return the winning maps or None if tied maps need another round. """
+        winners = [m for m, votes in self.votes.items() if votes == self.top]
+
+        if len(winners) == 1:
+            return winners
+        elif len(winners) == 2 and self.tie_count == 1:
+            return [rng.choice(winners)]
+        elif len(winners) == len(self.pool):  # Nobody broke the tie, another round wouldn't either
+            return [rng.choice(winners)]
+
+        if len(winners) == 2:
+            self.tie_count += 1
+
+        self.pool = winners
+        self.new_round()
+        return None
+
+
+class MatchTypeVote:
+    """ State of the captains vote for the number of maps. """
+
+    def __init__(self, captains, options=(1, 2, 3)):
+        """ Set attributes. """
+        self.captains = set(captains)
+        self.options = list(options)
+        self.votes = dict.fromkeys(self.options, 0)
+        self.ballots = {}
+        self.top = 0
+
+    @property
+    def done(self):
+        """ Whether both captains voted. """
+        return len(self.ballots) == len(self.captains)
+
+    def vote(self, captain, option):
+        """ Process a captain's vote for a match type. """
+        if captain not in self.captains:
+            raise VoteError('picker-not-captain')
+        if captain in self.ballots:
+            raise VoteError('already-voted')
+        if option not in self.votes:
+            raise VoteError('invalid-option')
+
+        self.ballots[captain] = option
+        self.votes[option] += 1
+        self.top = max(self.top, self.votes[option])
+
+    def result(self):
+        """ Number of maps voted, the shortest match type wins a tie and nobody voting means Bo1. """
+        winners = [option for option, votes in self.votes.items() if votes == self.top]
+        return winners[0] if len(winners) < len(self.options) else self.options[0]
+
+
+class CombinedVote:
+    """ State of a single round where the captains vote for the match type while everybody votes for maps. """
+
+    def __init__(self, maps, voters, captains, options=(1, 2, 3)):
+        """ Set attributes. """
+        self.match_type = MatchTypeVote(captains, options)
+        self.maps = MapVote(maps, voters)
+
+    @property
+    def done(self):
+        """ Whether the captains and everybody else voted. """
+        return self.match_type.done and self.maps.done
+
+    def result(self, rng=random):
+        """ Number of maps voted and the most voted maps for it, ties broken randomly. """
+        num_maps = self.match_type.result()
+        votes = self.maps.votes
+        ranked = sorted(self.maps.pool, key=lambda m: (votes[m], rng.random()), reverse=True)
+        return num_maps, ranked[:num_maps]
@@ -0,0 +1,157 @@
+# metrics.py
+
+from bisect import bisect_left
+import re
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BURST_BUCKETS = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)  # Match setups wait for the players
+_ID_PATTERN = re.compile(r'/\d+(?=/|$)')
+
+
+def _escape(value):
+    """ Escape a label value for the text exposition format. """
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    """ Braced label set of a sample, empty without labels. """
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def endpoint_label(path):
+    """ URL path with its numeric IDs replaced so every player or match shares a series. """
+    return _ID_PATTERN.sub('/:id', path)
+
+
+class Counter:
+    """ Monotonic count of events for each label set. """
+
+    type = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        """ Set attributes. """
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        """ Count events. """
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        """ Lines of the exposition of the counter. """
+        return [f'{self.name}{_label_str(self.labels, labels)} {value}' for labels, value in self.values.items()]
+
+
+class Gauge:
+    """ Value read when the metrics are scraped. """
+
+    type = 'gauge'
+
+    def __init__(self, name, description, read):
+        """ Set attributes. """
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def samples(self):
+        """ Lines of the exposition of the gauge. """
+        return [f'{self.name} {self.read()}']
+
+
+class Histogram:
+    """ Distribution of observed durations in cumulative buckets for each label set. """
+
+    type = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        """ Set attributes. """
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # Labels: [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        """ Record an observation. """
+        try:
+            series = self.series[labels]
+        except KeyError:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        """ Lines of the exposition of the histogram. """
+        lines = []
+
+        for labels, series in self.series.items():
+            count = 0
+
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), series):
+                count += bucket_count
+                lines.append(f'{self.name}_bucket{_label_str(self.labels, labels, ("le", bound))} {count}')
+
+            lines.append(f'{self.name}_sum{_label_str(self.labels, labels)} {series[-1]}')
+            lines.append(f'{self.name}_count{_label_str(self.labels, labels)} {count}')
+
+        return lines
+
+
+class Metrics:
+    """ Instruments of the bot's hot paths, only created when the metrics endpoint is enabled. """
+
+    def __init__(self):
+        """ Create the instruments. """
+        self.instruments = []
+        self.voice_state_update = self._add(Histogram('csgoleague_voice_state_update_seconds',
+                                                      'Time spent handling a voice state update, without the match '
+                                                      'setup of filled queues', ('outcome',)))
+        self.queue_burst = self._add(Histogram('csgoleague_queue_burst_seconds',
+                                               'Time spent setting the match of a filled queue up, from the ready '
+                                               'check until the queue reopens', buckets=BURST_BUCKETS))
+        self.api_request = self._add(Histogram('csgoleague_api_request_seconds', 'Latency of the API requests',
+                                               ('method', 'endpoint', 'status')))
+        self.db_query = self._add(Histogram('csgoleague_db_query_seconds', 'Latency of the database statements',
+                                            ('statement',)))
+        self.db_pool_wait = self._add(Histogram('csgoleague_db_pool_wait_seconds',
+                                                'Time waited for a database connection'))
+        self.rate_limits = self._add(Counter('csgoleague_discord_rate_limits_total',
+                                             'Discord 429 responses the bot waited for', ('scope',)))
+        self.queue_events = self._add(Counter('csgoleague_queue_events_total', 'Players joining and leaving queues',
+                                              ('event',)))
+        self.match_phases = self._add(Counter('csgoleague_match_phases_total', 'Matches entering each phase',
+                                              ('phase',)))
+        self.loop_lag = self._add(Histogram('csgoleague_event_loop_lag_seconds',
+                                            'Delay of the event loop in waking up a sleeping task',
+                                            buckets=LAG_BUCKETS))
+        self.loop_stalls = self._add(Counter('csgoleague_event_loop_stalls_total',
+                                             'Event loop lags past the watchdog threshold'))
+
+    def _add(self, instrument):
+        """ Register an instrument for the exposition. """
+        self.instruments.append(instrument)
+        return instrument
+
+    def gauge(self, name, description, read):
+        """ Register a gauge read at scrape time. """
+        return self._add(Gauge(name, description, read))
+
+    def render(self):
+        """ Metrics in the Prometheus text exposition format. """
+        lines = []
+
+        for instrument in self.instruments:
+            lines.append(f'# HELP {instrument.name} {instrument.description}')
+            lines.append(f'# TYPE {instrument.name} {instrument.type}')
+            lines.extend(instrument.samples())
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,100 @@
+# players.py
+
+import numpy as np
+
+
+class PlayerTable:
+    """ Columnar stats of many players with the derived metrics computed for all of them at once. """
+
+    COUNTERS = ('score', 'kills', 'deaths', 'headshots', 'damage', 'rounds', 'wins', 'losses', 'draws')
+    METRICS = ('score', 'kd', 'adr', 'hs', 'winrate')
+
+    def __init__(self, ids, names, columns):
+        """ Set attributes. """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = list(names)
+        self.columns = {counter: np.asarray(columns[counter], dtype=np.int64) for counter in self.COUNTERS}
+
+    @classmethod
+    def from_players(cls, players):
+        """ Build the table from the Player objects returned by the API. """
+        columns = {
+            'score': [p.score for p in players],
+            'kills': [p.kills for p in players],
+            'deaths': [p.deaths for p in players],
+            'headshots': [p.headshots for p in players],
+            'damage': [p.damage for p in players],
+            'rounds': [p.rounds_tr + p.rounds_ct for p in players],
+            'wins': [p.match_win for p in players],
+            'losses': [p.match_lose for p in players],
+            'draws': [p.match_draw for p in players]
+        }
+        return cls([p.discord for p in players], [p.discord_name for p in players], columns)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """ Build the table from leaderboard rows. """
+        columns = {counter: [row[counter] for row in rows] for counter in cls.COUNTERS}
+        return cls([row['user_id'] for row in rows], [row['name'] for row in rows], columns)
+
+    def __len__(self):
+        """ Number of players in the table. """
+        return len(self.ids)
+
+    @staticmethod
+    def _ratio(numerator, denominator):
+        """ Element-wise division with 0 where the denominator is 0. """
+        out = np.zeros(len(numerator), dtype=np.float64)
+        return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+    @property
+    def matches_played(self):
+        """ Matches played by every player. """
+        return self.columns['wins'] + self.columns['losses'] + self.columns['draws']
+
+    @property
+    def win_percent(self):
+        """ Win percentage of every player. """
+        return self._ratio(self.columns['wins'], self.columns['wins'] + self.columns['losses'])
+
+    @property
+    def kd_ratio(self):
+        """ K/D ratio of every player. """
+        return self._ratio(self.columns['kills'], self.columns['deaths'])
+
+    @property
+    def adr(self):
+        """ Average damage per round of every player. """
+        return self._ratio(self.columns['damage'], self.columns['rounds'])
+
+    @property
+    def hs_percent(self):
+        """ Headshot kill percentage of every player. """
+        return self._ratio(self.columns['headshots'], self.columns['kills'])
+
+    def metric(self, name):
+        """ Column of a ranking metric by its leaders command name. """
+        if name == 'score':
+            return self.columns['score']
+
+        return getattr(self, {'kd': 'kd_ratio', 'adr': 'adr', 'hs': 'hs_percent', 'winrate': 'win_percent'}[name])
+
+    def rank(self, metric, limit, offset=0, min_matches=0):
+        """ Return the indices of a page of the players ranked by a metric and the number of players ranked. """
+        values = self.metric(metric)
+        matches = self.matches_played
+        candidates = np.flatnonzero(matches >= min_matches)
+        end = min(offset + limit, len(candidates))
+
+        if end <= offset:
+            return np.empty(0, dtype=np.int64), len(candidates)
+
+        # Only the players up to the end of the page need sorting, with everybody tied with the last of them
+        if end < len(candidates):
+            threshold = -np.partition(-values[candidates], end - 1)[end - 1]
+            top = candidates[values[candidates] >= threshold]
+        else:
+            top = candidates
+
+        order = np.lexsort((-matches[top], -values[top]))
+        return top[order][offset:end], len(candidates)
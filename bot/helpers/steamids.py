@@ -0,0 +1,109 @@
+# steamids.py
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+
+PROFILE_URL = 'https://steamcommunity.com/id/{}/'
+
+
+def _parse(text):
+    """ SteamID of a Steam ID, None if the text isn't one, run in a lookup thread as importing steam is slow. """
+    from steam.steamid import SteamID
+
+    steam_id = SteamID(text)
+    return steam_id if steam_id.is_valid() else None
+
+
+def _from_url(url, timeout):
+    """ SteamID of a profile URL, None if the profile doesn't exist, run in a lookup thread. """
+    from steam.steamid import from_url
+
+    return from_url(url, http_timeout=timeout)
+
+
+class SteamResolver:
+    """ Resolves Steam IDs, profile URLs and vanity names in threads with a bounded cache of the lookups. """
+
+    def __init__(self, loop, timeout=10.0, cache_size=1024, ttl=86400.0, max_workers=2):
+        """ Set attributes. """
+        self.loop = loop
+        self.timeout = timeout  # Seconds all the lookups of a resolution may take together
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.cache = OrderedDict()  # Vanity name or URL: (SteamID, expiry), least recently used first
+        self.max_workers = max_workers
+        self.executor = None  # Created by start
+        self.logger = logging.getLogger('csgoleague.steam')
+
+    def start(self):
+        """ Create the pool of lookup threads, the threads are spawned by the first lookups. """
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='steam-resolver')
+
+    def close(self):
+        """ Stop the lookup threads once their requests end. """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def _cached(self, key):
+        """ Get an unexpired lookup from the cache. """
+        try:
+            steam_id, expiry = self.cache[key]
+        except KeyError:
+            return None
+
+        if expiry < self.loop.time():
+            del self.cache[key]
+            return None
+
+        self.cache.move_to_end(key)
+        return steam_id
+
+    def _store(self, key, steam_id):
+        """ Cache a lookup, evicting the least recently used ones past the cache size. """
+        self.cache[key] = (steam_id, self.loop.time() + self.ttl)
+        self.cache.move_to_end(key)
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def resolve(self, text):
+        """ SteamID of a Steam ID, profile URL or vanity name, None if it can't be resolved within the timeout. """
+        deadline = self.loop.time() + self.timeout
+
+        try:
+            steam_id = await asyncio.wait_for(self.loop.run_in_executor(self.executor, _parse, text), self.timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f'Parsing Steam ID "{text}" timed out after {self.timeout:.0f}s')
+            return None
+
+        if steam_id is not None:
+            return steam_id
+
+        key = text.strip().rstrip('/').lower()
+        steam_id = self._cached(key)
+
+        if steam_id is not None:
+            return steam_id
+
+        for url in (text, PROFILE_URL.format(text)):
+            remaining = deadline - self.loop.time()
+
+            if remaining <= 0:
+                break
+
+            lookup = self.loop.run_in_executor(self.executor, partial(_from_url, url, remaining))
+
+            try:
+                steam_id = await asyncio.wait_for(lookup, remaining)
+            except asyncio.TimeoutError:
+                self.logger.warning(f'Resolving Steam profile "{text}" timed out after {self.timeout:.0f}s')
+                return None
+
+            if steam_id is not None:
+                self._store(key, steam_id)
+                return steam_id
+
+        return None
@@ -0,0 +1,204 @@
+# tracing.py
+
+import aiohttp
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+import json
+import logging
+import os
+import time
+
+_trace = ContextVar('trace', default=None)
+
+# Chrome trace lane of each span category
+LANES = {'phase': 1, 'menu': 2, 'discord': 3, 'api': 4, 'db': 5}
+
+
+def get_trace():
+    """ Match trace of the current event, None when it isn't traced. """
+    return _trace.get()
+
+
+def set_trace(trace):
+    """ Record the spans of the rest of the current event in a match trace. """
+    _trace.set(trace)
+
+
+def record_span(name, category, start, end, **args):
+    """ Add a span measured with time.perf_counter to the current match trace, if any. """
+    trace = _trace.get()
+
+    if trace is not None:
+        trace.spans.append((name, category, start, end, args))
+
+
+class _Span:
+    """ Context manager recording the duration of its block as a span. """
+
+    __slots__ = ('trace', 'name', 'category', 'args', 'start')
+
+    def __init__(self, trace, name, category, args):
+        """ Set attributes. """
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        """ Start the span. """
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """ End the span, failed blocks are marked. """
+        if exc_info[0] is not None:
+            self.args['error'] = exc_info[0].__name__
+
+        self.trace.spans.append((self.name, self.category, self.start, time.perf_counter(), self.args))
+
+
+class _NoSpan:
+    """ Context manager of the spans outside of a match trace. """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        """ Nothing to start. """
+        return self
+
+    def __exit__(self, *exc_info):
+        """ Nothing to record. """
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category='phase', **args):
+    """ Time a block as a span of the current match trace, does nothing outside of one. """
+    trace = _trace.get()
+    return _NO_SPAN if trace is None else _Span(trace, name, category, args)
+
+
+def traced_request(request):
+    """ Wrap discord.py's HTTP request so every REST call of a match is a span. """
+    @wraps(request)
+    async def wrapper(route, **kwargs):
+        """ Time the REST call. """
+        with span(f'{route.method} {route.path}', 'discord'):
+            return await request(route, **kwargs)
+
+    return wrapper
+
+
+class MatchTrace:
+    """ Spans of a match from its queue filling up to its players being moved. """
+
+    def __init__(self, category_id):
+        """ Set attributes. """
+        self.category_id = category_id
+        self.match_id = None
+        self.outcome = None
+        self.created_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []  # (name, category, start, end, args)
+
+    @property
+    def duration(self):
+        """ Seconds the match took to start. """
+        return (self.end or time.perf_counter()) - self.start
+
+    def phases(self):
+        """ Durations of the phases of the match, slowest first. """
+        phases = [(name, end - start) for name, category, start, end, args in self.spans if category == 'phase']
+        return sorted(phases, key=lambda phase: phase[1], reverse=True)
+
+    def to_chrome(self):
+        """ Trace in the Chrome trace event format, loadable in chrome://tracing and Perfetto. """
+        ids = {'match_id': self.match_id, 'category_id': self.category_id}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0,
+                   'args': {'name': f'Match {self.match_id or "-"} of pug {self.category_id}'}}]
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': category}}
+                      for category, tid in LANES.items())
+        events.append({'name': 'match', 'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': 0, 'ts': 0,
+                       'dur': round(self.duration * 1e6), 'args': dict(ids, outcome=self.outcome)})
+
+        for name, category, start, end, args in self.spans:
+            events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': LANES[category],
+                           'ts': round((start - self.start) * 1e6), 'dur': round((end - start) * 1e6),
+                           'args': dict(ids, **args)})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class Tracer:
+    """ Traces the matches as they start and exports the traces to a directory, keeping the recent ones. """
+
+    def __init__(self, loop, directory, keep=100):
+        """ Set attributes. """
+        self.loop = loop
+        self.directory = directory
+        self.keep = keep  # Trace files and in-memory traces kept
+        self.recent = deque(maxlen=keep)
+        self.logger = logging.getLogger('csgoleague.tracing')
+
+    def trace_config(self):
+        """ aiohttp trace config recording the API requests of a match. """
+        async def on_request_start(session, ctx, params):
+            """ Start timing an API request. """
+            ctx.trace_start = time.perf_counter()
+
+        async def on_request_end(session, ctx, params):
+            """ Record an API request. """
+            record_span(f'{params.method} {params.url.path}', 'api', ctx.trace_start, time.perf_counter(),
+                        status=params.response.status)
+
+        async def on_request_exception(session, ctx, params):
+            """ Record an API request that failed without a response. """
+            record_span(f'{params.method} {params.url.path}', 'api', ctx.trace_start, time.perf_counter(),
+                        error=type(params.exception).__name__)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def start(self, category_id):
+        """ Trace the rest of the current event as the start of a match. """
+        trace = MatchTrace(category_id)
+        set_trace(trace)
+        return trace
+
+    def finish(self, trace, outcome):
+        """ End a match trace and export it in the background. """
+        trace.end = time.perf_counter()
+        trace.outcome = outcome
+        self.recent.append(trace)
+        set_trace(None)
+        self.loop.run_in_executor(None, self._export, trace, trace.to_chrome())
+
+    def slowest(self, num, category_id=None):
+        """ Slowest of the recent match traces, only those of a pug if its category is given. """
+        traces = [trace for trace in self.recent if category_id is None or trace.category_id == category_id]
+        return sorted(traces, key=lambda trace: trace.duration, reverse=True)[:num]
+
+    def _export(self, trace, chrome_trace):
+        """ Write a trace file and remove the oldest ones past the number kept. """
+        name = time.strftime('%Y%m%d-%H%M%S', time.localtime(trace.created_at))
+        path = os.path.join(self.directory, f'match-{name}-{trace.match_id or trace.category_id}.json')
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(path, 'w') as f:
+                json.dump(chrome_trace, f)
+
+            files = sorted(f for f in os.listdir(self.directory) if f.startswith('match-') and f.endswith('.json'))
+
+            for old_file in files[:-self.keep]:
+                os.remove(os.path.join(self.directory, old_file))
+        except OSError as e:
+            self.logger.error(f'Unable to export match trace to {path}: {e}')
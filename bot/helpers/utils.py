@@ -5,29 +5,131 @@ import os
 import re
 import json
 import asyncio
-
-from dotenv import load_dotenv
+import random
+from contextvars import ContextVar
+from functools import lru_cache
+from string import Formatter
 
 
 time_arg_pattern = re.compile(r'\b((?:(?P<days>[0-9]+)d)|(?:(?P<hours>[0-9]+)h)|(?:(?P<minutes>[0-9]+)m))\b')
 
-load_dotenv()
 
-with open('translations.json', encoding="utf8") as f:
-    translations = json.load(f)
+class Locale:
+    """ Texts of a language with their format templates precompiled into callables. """
+
+    def __init__(self, name, texts):
+        """ Set attributes. """
+        self.name = name
+        self.texts = texts
+        self.formatters = {key: text.format for key, text in texts.items()}
+
+
+def _num_fields(template):
+    """ Number of replacement fields in a format template, None if the template is malformed. """
+    try:
+        return sum(1 for _, field, _, _ in Formatter().parse(template) if field is not None)
+    except ValueError:
+        return None
+
+
+class Catalog:
+    """ Every locale of the translations file, completed and validated against the english texts. """
+
+    def __init__(self, translations, default_locale):
+        """ Set attributes and build the locales. """
+        english = translations['en']
+        self.locales = {}
+        self.missing = {}  # Keys of each locale that fell back to english
+        self.unknown = {}  # Keys of each locale that english doesn't have
+
+        for name, texts in translations.items():
+            checked = {}
+
+            for key, text in english.items():
+                template = texts.get(key)
+
+                if template is None or _num_fields(template) != _num_fields(text):
+                    self.missing.setdefault(name, []).append(key)
+                    template = text
+
+                checked[key] = template
+
+            unknown = [key for key in texts if key not in english]
+
+            if unknown:
+                self.unknown[name] = unknown
+
+            self.locales[name] = Locale(name, checked)
+
+        self.default = self.locales.get(default_locale, self.locales['en'])
+
+
+@lru_cache(maxsize=None)
+def load_catalog():
+    """ Read and compile the translations file the first time a text is translated. """
+    with open('translations.json', encoding="utf8") as f:
+        translations = json.load(f)
+
+    return Catalog(translations, os.environ.get('DISCORD_LEAGUE_LANGUAGE', 'en'))
+
+
+_locale = ContextVar('locale', default=None)
+
+
+def set_locale(name):
+    """ Translate the texts of the current event and the tasks it starts in a locale, None for the default. """
+    _locale.set(load_catalog().locales.get(name))
+
+
+def get_locale():
+    """ Name of the locale the current event is translated in. """
+    return (_locale.get() or load_catalog().default).name
+
+
+_log_context = ContextVar('log_context', default={})
+_debug_sample_rate = 1.0  # Share of the debug records kept, set when the logging is set up
+
+
+def set_log_context(**fields):
+    """ Add fields to the log records of the current event and the tasks it starts. """
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def get_log_context():
+    """ Fields of the log records of the current event. """
+    return _log_context.get()
+
+
+def set_debug_sample_rate(rate):
+    """ Keep a share of the debug records. """
+    global _debug_sample_rate
+    _debug_sample_rate = rate
+
+
+def sample_debug():
+    """ Draw whether a debug record is kept, so the records costly to build are only built when they are logged. """
+    return _debug_sample_rate >= 1 or random.random() < _debug_sample_rate
 
 
 def translate(text, *args):
+    locale = _locale.get() or load_catalog().default
+
     if args:
-        try:
-            return translations[os.environ['DISCORD_LEAGUE_LANGUAGE']][text].format(*args)
-        except (KeyError, ValueError):
-            return translations['en'][text].format(*args)
+        return locale.formatters[text](*args)
     else:
-        try:
-            return translations[os.environ['DISCORD_LEAGUE_LANGUAGE']][text]
-        except (KeyError, ValueError):
-            return translations['en'][text]
+        return locale.texts[text]
+
+
+class LazyTranslation:
+    """ Text translated in the current locale each time it is rendered, for the texts set at import time. """
+
+    def __init__(self, text):
+        """ Set attributes. """
+        self.text = text
+
+    def __str__(self):
+        """ Translate the text. """
+        return translate(self.text)
 
 
 def align_text(text, length, align='center'):
@@ -0,0 +1,98 @@
+# watchdog.py
+
+import asyncio
+from collections import deque
+import logging
+import sys
+import threading
+import time
+import traceback
+
+STACK_LIMIT = 25  # Innermost frames of the loop thread logged when it is blocked
+
+
+class LoopWatchdog:
+    """ Measures the event loop's scheduling lag and logs what the loop thread runs while it is blocked. """
+
+    def __init__(self, loop, interval=0.5, threshold=0.25, report_interval=300.0, metrics=None):
+        """ Set attributes. """
+        self.loop = loop
+        self.interval = interval  # Seconds between the lag measures
+        self.threshold = threshold  # Seconds of lag considered a block of the loop
+        self.report_interval = report_interval  # Seconds between the logged lag percentiles
+        self.metrics = metrics
+        self.lags = deque(maxlen=max(int(report_interval / interval), 1))
+        self.beat = None  # Monotonic time the loop is expected to wake the watchdog up
+        self.loop_thread_id = None
+        self.task = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger('csgoleague.watchdog')
+
+    def start(self):
+        """ Start measuring the lag, must be called from the loop thread. """
+        self.loop_thread_id = threading.get_ident()
+        self.beat = time.monotonic() + self.interval
+        self.task = self.loop.create_task(self._measure())
+        self.thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stop measuring the lag. """
+        self.stopped.set()
+
+        if self.task is not None:
+            self.task.cancel()
+
+    def percentiles(self, *shares):
+        """ Percentiles of the recent lags in seconds. """
+        lags = sorted(self.lags)
+
+        if not lags:
+            return [0.0] * len(shares)
+
+        return [lags[min(int(len(lags) * share), len(lags) - 1)] for share in shares]
+
+    async def _measure(self):
+        """ Sleep for the interval and measure how late the loop wakes up, logging the percentiles now and then. """
+        next_report = time.monotonic() + self.report_interval
+
+        while True:
+            self.beat = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - self.beat, 0.0)
+            self.lags.append(lag)
+
+            if self.metrics is not None:
+                self.metrics.loop_lag.observe(lag)
+
+                if lag >= self.threshold:
+                    self.metrics.loop_stalls.inc()
+
+            if now >= next_report:
+                next_report = now + self.report_interval
+                p50, p99 = self.percentiles(0.5, 0.99)
+                self.logger.info(f'Event loop lag over the last {len(self.lags)} measures: p50 {p50 * 1000:.1f} ms, '
+                                 f'p99 {p99 * 1000:.1f} ms, max {max(self.lags) * 1000:.1f} ms')
+
+    def _watch(self):
+        """ Sample the stack of the loop thread once each time the loop stays blocked past the threshold. """
+        sampled_beat = None
+
+        while not self.stopped.wait(self.threshold / 2):
+            beat = self.beat
+            blocked = time.monotonic() - beat
+
+            if blocked < self.threshold or beat == sampled_beat:
+                continue
+
+            sampled_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+
+            if frame is None:  # Loop thread is gone
+                return
+
+            stack = ''.join(traceback.format_stack(frame, limit=STACK_LIMIT))
+            self.logger.warning(f'Event loop blocked for {blocked * 1000:.0f} ms, the loop thread is running:\n'
+                                f'{stack}')
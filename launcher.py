@@ -1,17 +1,18 @@
 # launcher.py
 
-from bot.bot import LeagueBot
-
 import argparse
-import asyncio
-import asyncpg
-from dotenv import load_dotenv
 import os
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
 
 load_dotenv() # Load the environment variables in the local .env file
 
-def run_bot():
-    """ Parse the config file and run the bot. """
+
+def get_config():
+    """ Get the bot arguments from the environment variables. """
     # Get database object for bot
     db_connect_url = 'postgresql://{POSTGRESQL_USER}:{POSTGRESQL_PASSWORD}@{POSTGRESQL_HOST}:{POSTGRESQL_PORT}/{POSTGRESQL_DB}'
     db_connect_url = db_connect_url.format(**os.environ)
@@ -21,14 +22,99 @@ def run_bot():
     api_url = os.environ['CSGO_LEAGUE_API_URL']
     api_key = os.environ['CSGO_LEAGUE_API_KEY']
     donate_url = os.environ['CSGO_LEAGUE_DONATE_URL']
+    webhook_host = os.environ.get('CSGO_LEAGUE_WEBHOOK_HOST', '127.0.0.1')
+    webhook_port = os.environ.get('CSGO_LEAGUE_WEBHOOK_PORT')
+    webhook_secret = os.environ.get('CSGO_LEAGUE_WEBHOOK_SECRET')
+    metrics_host = os.environ.get('CSGO_LEAGUE_METRICS_HOST', '127.0.0.1')
+    metrics_port = os.environ.get('CSGO_LEAGUE_METRICS_PORT')
+    trace_dir = os.environ.get('CSGO_LEAGUE_TRACE_DIR')
+    slow_statement_ms = float(os.environ.get('CSGO_LEAGUE_DB_SLOW_MS', 100))
+    loop_lag_ms = float(os.environ.get('CSGO_LEAGUE_LOOP_LAG_MS', 250))
 
     if api_url.endswith('/'):
         api_url = api_url[:-1]
+
+    return (bot_token, api_url, api_key, db_connect_url, donate_url,
+            webhook_host, int(webhook_port) if webhook_port else None, webhook_secret,
+            metrics_host, int(metrics_port) if metrics_port else None, trace_dir,
+            slow_statement_ms, loop_lag_ms)
+
+
+def get_logging_config():
+    """ Get the logging options from the environment variables. """
+    json_file = os.environ.get('CSGO_LEAGUE_LOG_JSON', '').lower() in ('1', 'true', 'yes')
+    debug_sample_rate = float(os.environ.get('CSGO_LEAGUE_LOG_DEBUG_SAMPLE', 1))
+    return {'json_file': json_file, 'debug_sample_rate': debug_sample_rate}
+
+
+def run_bot():
+    """ Parse the config file and run the bot. """
+    from bot.bot import LeagueBot
+    from bot.cogs.logging import setup_logging
+
+    setup_logging(**get_logging_config())
+
     # Instantiate bot and run
-    bot = LeagueBot(bot_token, api_url, api_key, db_connect_url, donate_url)
+    bot = LeagueBot(*get_config())
     bot.run()
 
 
+def profile_startup(num_modules):
+    """ Report the import cost of the slowest modules then the cost of each initialization step. """
+    # Import the bot in a fresh interpreter so every module is imported once and timed
+    command = [sys.executable, '-X', 'importtime', '-c', 'import bot.bot']
+    process = subprocess.run(command, stderr=subprocess.PIPE, universal_newlines=True)
+    imports = []
+    errors = []
+
+    for line in process.stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+
+        if line.startswith('import time:') and len(fields) == 3 and fields[0].strip().isdigit():
+            imports.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+        elif not line.startswith('import time:'):
+            errors.append(line)
+
+    if process.returncode != 0:
+        print('Importing the bot failed:\n' + '\n'.join(errors))
+        return
+
+    print(f'Slowest of {len(imports)} module imports (self / cumulative):')
+
+    for self_us, cumulative_us, module in sorted(imports, reverse=True)[:num_modules]:
+        print(f'    {module:<40} {self_us / 1000:>8.1f} ms {cumulative_us / 1000:>8.1f} ms')
+
+    # Time the initialization steps of the bot in this interpreter
+    print('Initialization steps:')
+
+    def timed(step, func, *args):
+        """ Run a step and print how long it took. """
+        start = time.perf_counter()
+        result = func(*args)
+        print(f'    {step:<40} {(time.perf_counter() - start) * 1000:>8.1f} ms')
+        return result
+
+    from bot.helpers.assets import map_icons
+    from bot.helpers.utils import load_catalog
+
+    timed('translation catalog', load_catalog)
+    timed('asset manifest', map_icons)
+
+    from bot.bot import LeagueBot
+    from bot.cogs.logging import setup_logging
+
+    timed('logging setup', lambda: setup_logging(**get_logging_config()))
+    timed('LeagueBot()', LeagueBot, *get_config())  # Starts no task nor thread, they are started by the bot setup
+
+
 if __name__ == '__main__':
-    argparse.ArgumentParser(description='Run the CS:GO League bot')
-    run_bot()
+    parser = argparse.ArgumentParser(description='Run the CS:GO League bot')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report the import and initialization cost of the bot instead of running it')
+    parser.add_argument('--modules', type=int, default=25, help='Number of modules the startup profile reports')
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup(args.modules)
+    else:
+        run_bot()
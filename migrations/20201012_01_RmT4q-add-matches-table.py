@@ -0,0 +1,32 @@
+# 20201012_01_RmT4q-add-matches-table.py
+
+from yoyo import step
+
+__depends__ = {'20200923_01_DKHHX-add-spect_users-table'}
+
+
+steps = [
+    step(
+        'CREATE TYPE match_phase AS ENUM(\'setup\', \'backlog\', \'live\');',
+        'DROP TYPE match_phase;'
+    ),
+    step(
+        (
+            'CREATE TABLE matches(\n'
+            '    id BIGINT PRIMARY KEY,\n'
+            '    pug_id BIGINT REFERENCES pugs (id) ON DELETE CASCADE,\n'
+            '    channel_id BIGINT NOT NULL,\n'
+            '    phase match_phase DEFAULT \'setup\',\n'
+            '    match_id TEXT DEFAULT NULL UNIQUE,\n'
+            '    match_category BIGINT DEFAULT NULL,\n'
+            '    channel_team_one BIGINT DEFAULT NULL,\n'
+            '    channel_team_two BIGINT DEFAULT NULL,\n'
+            '    members_team_one BIGINT[] NOT NULL DEFAULT \'{}\',\n'
+            '    members_team_two BIGINT[] NOT NULL DEFAULT \'{}\',\n'
+            '    maps TEXT[] NOT NULL DEFAULT \'{}\',\n'
+            '    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()\n'
+            ');'
+        ),
+        'DROP TABLE matches;'
+    )
+]
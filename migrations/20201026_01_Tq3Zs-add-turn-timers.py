@@ -0,0 +1,31 @@
+# 20201026_01_Tq3Zs-add-turn-timers.py
+
+from yoyo import step
+
+__depends__ = {'20201012_01_RmT4q-add-matches-table'}
+
+
+steps = [
+    step(
+        (
+            'ALTER TABLE pugs\n'
+            'ADD COLUMN turn_time SMALLINT DEFAULT 60;'
+        ),
+        (
+            'ALTER TABLE pugs\n'
+            'DROP COLUMN turn_time;'
+        )
+    ),
+    step(
+        (
+            'CREATE TABLE map_bans(\n'
+            '    pug_id BIGINT REFERENCES pugs (id) ON DELETE CASCADE,\n'
+            '    map TEXT NOT NULL,\n'
+            '    offered INTEGER NOT NULL DEFAULT 0,\n'
+            '    banned INTEGER NOT NULL DEFAULT 0,\n'
+            '    CONSTRAINT map_bans_pkey PRIMARY KEY (pug_id, map)\n'
+            ');'
+        ),
+        'DROP TABLE map_bans;'
+    )
+]
@@ -0,0 +1,19 @@
+# 20201028_01_Hn7Wd-add-combined-vote-column.py
+
+from yoyo import step
+
+__depends__ = {'20201026_01_Tq3Zs-add-turn-timers'}
+
+
+steps = [
+    step(
+        (
+            'ALTER TABLE pugs\n'
+            'ADD COLUMN combined_vote BOOL NOT NULL DEFAULT false;'
+        ),
+        (
+            'ALTER TABLE pugs\n'
+            'DROP COLUMN combined_vote;'
+        )
+    )
+]
@@ -0,0 +1,33 @@
+# 20201030_01_Lb4Kq-add-leaderboard-table.py
+
+from yoyo import step
+
+__depends__ = {'20201028_01_Hn7Wd-add-combined-vote-column'}
+
+
+steps = [
+    step(
+        (
+            'CREATE TABLE leaderboard(\n'
+            '    guild_id BIGINT NOT NULL,\n'
+            '    user_id BIGINT NOT NULL,\n'
+            '    name TEXT NOT NULL DEFAULT \'\',\n'
+            '    score INTEGER NOT NULL DEFAULT 0,\n'
+            '    kills INTEGER NOT NULL DEFAULT 0,\n'
+            '    deaths INTEGER NOT NULL DEFAULT 0,\n'
+            '    headshots INTEGER NOT NULL DEFAULT 0,\n'
+            '    damage INTEGER NOT NULL DEFAULT 0,\n'
+            '    rounds INTEGER NOT NULL DEFAULT 0,\n'
+            '    wins INTEGER NOT NULL DEFAULT 0,\n'
+            '    losses INTEGER NOT NULL DEFAULT 0,\n'
+            '    draws INTEGER NOT NULL DEFAULT 0,\n'
+            '    CONSTRAINT leaderboard_pkey PRIMARY KEY (guild_id, user_id)\n'
+            ');'
+        ),
+        'DROP TABLE leaderboard;'
+    ),
+    step(
+        'CREATE INDEX leaderboard_rank_idx ON leaderboard (guild_id, score DESC, (wins + losses + draws) DESC);',
+        'DROP INDEX leaderboard_rank_idx;'
+    )
+]
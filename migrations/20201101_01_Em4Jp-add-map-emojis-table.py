@@ -0,0 +1,20 @@
+# 20201101_01_Em4Jp-add-map-emojis-table.py
+
+from yoyo import step
+
+__depends__ = {'20201030_01_Lb4Kq-add-leaderboard-table'}
+
+
+steps = [
+    step(
+        (
+            'CREATE TABLE map_emojis(\n'
+            '    dev_name VARCHAR(32) PRIMARY KEY,\n'
+            '    guild_id BIGINT NOT NULL,\n'
+            '    emoji_id BIGINT NOT NULL,\n'
+            '    content_hash CHAR(40) NOT NULL\n'
+            ');'
+        ),
+        'DROP TABLE map_emojis;'
+    )
+]
@@ -0,0 +1,19 @@
+# 20201103_01_Lc9Rt-add-language-column.py
+
+from yoyo import step
+
+__depends__ = {'20201101_01_Em4Jp-add-map-emojis-table'}
+
+
+steps = [
+    step(
+        (
+            'ALTER TABLE pugs\n'
+            'ADD COLUMN language VARCHAR(8) DEFAULT NULL;'
+        ),
+        (
+            'ALTER TABLE pugs\n'
+            'DROP COLUMN language;'
+        )
+    )
+]
@@ -0,0 +1,18 @@
+# 20201105_01_Lg5Bt-add-leaderboard-guilds-table.py
+
+from yoyo import step
+
+__depends__ = {'20201103_01_Lc9Rt-add-language-column'}
+
+
+steps = [
+    step(
+        (
+            'CREATE TABLE leaderboard_guilds(\n'
+            '    guild_id BIGINT PRIMARY KEY,\n'
+            '    built_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()\n'
+            ');'
+        ),
+        'DROP TABLE leaderboard_guilds;'
+    )
+]
@@ -0,0 +1,150 @@
+# test_reservation.py
+
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.cogs.match import MatchCog
+from bot.helpers.api import ApiHelper
+
+MATCH = {'match_id': 7, 'ip': '127.0.0.1', 'port': 27015}
+
+
+class Member:
+    """ Stand-in for a Discord member. """
+
+    def __init__(self, member_id):
+        """ Set attributes. """
+        self.id = member_id
+        self.display_name = f'player{member_id}'
+
+
+async def reserve_not_found(request):
+    raise web.HTTPNotFound()
+
+
+async def reserve_not_allowed(request):
+    raise web.HTTPMethodNotAllowed('POST', [])
+
+
+async def reserve_not_json(request):
+    return web.Response(text='<html>Match panel</html>', content_type='text/html')
+
+
+async def reserve_without_id(request):
+    return web.json_response({'status': 'ok'})
+
+
+@pytest.mark.parametrize('reserve', [reserve_not_found, reserve_not_allowed, reserve_not_json, reserve_without_id])
+def test_reservation_falls_back_to_unreserved_start(reserve):
+    """ A web API that can't reserve a server slot still starts the match, without a reservation. """
+    starts = []
+
+    async def start(request):
+        starts.append(await request.json())
+        return web.json_response(MATCH)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/match/reserve', reserve)
+        app.router.add_post('/match/start', start)
+        server = TestServer(app)
+        await server.start_server()
+        api_helper = ApiHelper(asyncio.get_event_loop(), str(server.make_url('')).rstrip('/'), 'key')
+        await api_helper.connect()
+
+        try:
+            reservation = api_helper.reserve_server_slot()
+            await asyncio.wait([reservation.task])
+            assert not reservation.failed
+            match = await reservation.commit([Member(1)], [Member(2)])
+            await reservation.release()
+            return match
+        finally:
+            await api_helper.close()
+            await server.close()
+
+    match = asyncio.new_event_loop().run_until_complete(run())
+    assert match.id == MATCH['match_id']
+    assert len(starts) == 1 and 'reservation_id' not in starts[0]
+
+
+def test_reservation_is_sent_on_start():
+    """ A reserved server slot is passed to the match start. """
+    starts = []
+
+    async def reserve(request):
+        return web.json_response({'reservation_id': 'abc'})
+
+    async def start(request):
+        starts.append(await request.json())
+        return web.json_response(MATCH)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/match/reserve', reserve)
+        app.router.add_post('/match/start', start)
+        server = TestServer(app)
+        await server.start_server()
+        api_helper = ApiHelper(asyncio.get_event_loop(), str(server.make_url('')).rstrip('/'), 'key')
+        await api_helper.connect()
+
+        try:
+            reservation = api_helper.reserve_server_slot()
+            await reservation.commit([Member(1)], [Member(2)])
+        finally:
+            await api_helper.close()
+            await server.close()
+
+    asyncio.new_event_loop().run_until_complete(run())
+    assert starts[0]['reservation_id'] == 'abc'
+
+
+class Backlog:
+    """ Stand-in for a full match backlog. """
+
+    def has_room(self, guild):
+        """ No match can wait for a server. """
+        return False
+
+
+def test_no_servers_reply_aborts_the_draft():
+    """ A reservation refused for lack of servers stops the pre-match phase before it ends. """
+    drafted = []
+
+    async def reserve(request):
+        raise web.HTTPServiceUnavailable()
+
+    async def draft():
+        await asyncio.sleep(60)
+        drafted.append(True)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/match/reserve', reserve)
+        server = TestServer(app)
+        await server.start_server()
+        loop = asyncio.get_event_loop()
+        api_helper = ApiHelper(loop, str(server.make_url('')).rstrip('/'), 'key')
+        await api_helper.connect()
+        match_cog = MatchCog.__new__(MatchCog)
+        match_cog.bot = type('Bot', (), {'loop': loop, 'metrics': None})()
+        match_cog.backlog = Backlog()
+
+        try:
+            reservation = api_helper.reserve_server_slot()
+
+            with pytest.raises(aiohttp.ClientResponseError) as error:
+                await asyncio.wait_for(match_cog.run_phase(None, reservation, draft()), 5)
+
+            await reservation.release()
+            return error.value.status
+        finally:
+            await api_helper.close()
+            await server.close()
+
+    assert asyncio.new_event_loop().run_until_complete(run()) == 503
+    assert not drafted